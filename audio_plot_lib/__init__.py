@@ -1,2 +1,14 @@
-from . import playable
-from . import interactive
+import importlib
+
+# submodules are imported on first use, so that rendering audio does not load bokeh or IPython
+__all__ = ["downsampling", "encoding", "interactive", "live", "playable", "stats", "synthesis", "tts"]
+
+
+def __getattr__(name):
+    if name in __all__:
+        return importlib.import_module("." + name, __name__)
+    raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
+
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
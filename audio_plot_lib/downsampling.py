@@ -0,0 +1,118 @@
+import warnings
+import numpy as np
+
+
+def __buckets(y, n_buckets):
+    # pad with NaN so that the series can be reshaped into buckets of the same length
+    size = int(np.ceil(len(y) / n_buckets))
+    padded = np.full(size * n_buckets, np.nan, dtype=y.dtype)
+    padded[:len(y)] = y
+    return padded.reshape((n_buckets, size)), size
+
+
+def minmax(y: np.array, n_points: int) -> np.array:
+    """Minimum and maximum of each bucket in their original order
+
+    Spikes in either direction survive the reduction.
+
+    Parameters
+    ----------
+    y : np.array
+        A one-dimensional series.
+    n_points : int
+        Maximum number of points after the reduction.
+
+    Returns
+    -------
+    np.array
+        Reduced series of at most n_points values.
+    """
+    n_buckets = max(1, n_points // 2)
+    buckets, size = __buckets(y, n_buckets)
+    valid = ~np.isnan(buckets)
+
+    lo = np.where(valid, buckets, np.inf).argmin(axis=1)
+    hi = np.where(valid, buckets, -np.inf).argmax(axis=1)
+    first = np.minimum(lo, hi)
+    second = np.maximum(lo, hi)
+
+    rows = np.arange(n_buckets)
+    reduced = np.stack([buckets[rows, first], buckets[rows, second]], axis=1).reshape(-1)
+    # drop the padding of the last bucket
+    return reduced[:2 * int(np.ceil(len(y) / size))]
+
+
+def mean(y: np.array, n_points: int) -> np.array:
+    """Mean of each bucket"""
+    buckets, size = __buckets(y, max(1, n_points))
+    with warnings.catch_warnings():
+        # buckets of only NaN stay NaN, which is rendered as silence
+        warnings.simplefilter("ignore", RuntimeWarning)
+        reduced = np.nanmean(buckets, axis=1)
+    return reduced[:int(np.ceil(len(y) / size))]
+
+
+def lttb(y: np.array, n_points: int) -> np.array:
+    """Largest-Triangle-Three-Buckets reduction of a series with evenly spaced x
+
+    The first and last points are kept, and from each bucket in between
+    the point forming the largest triangle with the previously selected point
+    and the mean of the next bucket is selected.
+    """
+    if n_points >= len(y) or n_points < 3:
+        return y[np.linspace(0, len(y) - 1, min(len(y), max(n_points, 1))).astype(int)]
+
+    edges = np.linspace(1, len(y) - 1, n_points - 1).astype(int)
+    x = np.arange(len(y), dtype=float)
+    values = np.where(np.isnan(y), np.nanmean(y), y)
+
+    # mean of the next bucket of each bucket, the last one being the last point
+    sums = np.add.reduceat(values[:len(y) - 1], edges[:-1])
+    counts = np.diff(edges)
+    next_x = np.append(((edges[1:-1] + edges[2:] - 1) / 2), len(y) - 1)
+    next_y = np.append((sums / counts)[1:], values[-1])
+
+    selected = np.empty(n_points, dtype=int)
+    selected[0] = 0
+    selected[-1] = len(y) - 1
+    a = 0
+    for b in range(n_points - 2):
+        start, end = edges[b], edges[b + 1]
+        area = np.abs((x[a] - next_x[b]) * (values[start:end] - values[a])
+                      - (x[a] - x[start:end]) * (next_y[b] - values[a]))
+        a = start + int(area.argmax())
+        selected[b + 1] = a
+
+    return y[selected]
+
+
+METHODS = {"minmax": minmax, "mean": mean, "lttb": lttb}
+
+
+def reduce(lines: np.array, n_points: int, method: str="minmax") -> np.array:
+    """Reduce each column of lines to at most n_points rows
+
+    Parameters
+    ----------
+    lines : np.array
+        A two-dimensional array whose rows are the data length and columns are the data type.
+    n_points : int
+        Maximum number of rows after the reduction.
+    method : str
+        "minmax" (default), "mean" or "lttb".
+
+    Returns
+    -------
+    np.array
+        lines itself if it has no more than n_points rows, otherwise the reduced array.
+    """
+    assert method in METHODS, "method must be one of {}".format(list(METHODS))
+    assert n_points >= 2, "n_points must be 2 or more"
+
+    if lines.shape[0] <= n_points:
+        return lines
+
+    # float columns keep their precision, others are reduced as float64 to hold NaN
+    dtype = lines.dtype if lines.dtype.kind == "f" else np.float64
+    return np.stack([METHODS[method](np.asarray(lines[:, t], dtype=dtype), n_points)
+                     for t in range(lines.shape[1])], axis=1)
@@ -0,0 +1,149 @@
+import os
+import struct
+import wave
+import numpy as np
+from .synthesis import FRAME_RATE, SAMPLE_WIDTH
+
+# compressed formats are encoded in process by the optional soundfile package (libsndfile)
+COMPRESSED_FORMATS = {"flac": ("FLAC", "PCM_16"), "ogg": ("OGG", "VORBIS"), "mp3": ("MP3", "MPEG_LAYER_III")}
+FORMATS = ["wav"] + list(COMPRESSED_FORMATS)
+SAMPLE_WIDTHS = [1, SAMPLE_WIDTH]
+
+
+def __pcm(samples, sample_width=SAMPLE_WIDTH):
+    if sample_width == 1:
+        # the high byte of each sample, which 8-bit WAV files store as unsigned
+        return ((np.asarray(samples, dtype=np.int16) >> 8) + 128).astype(np.uint8)
+    # a view of the samples unless they are not contiguous little-endian 16-bit integers
+    return np.ascontiguousarray(samples, dtype="<i2")
+
+
+def wav_header(n_frames: int, frame_rate: int=FRAME_RATE, channels: int=2, sample_width: int=SAMPLE_WIDTH) -> bytes:
+    """44 bytes of the header of a PCM WAV file with n_frames frames"""
+    data_size = n_frames * channels * sample_width
+    return struct.pack("<4sI4s4sIHHIIHH4sI", b"RIFF", 36 + data_size, b"WAVE", b"fmt ", 16, 1, channels, frame_rate,
+                       frame_rate * channels * sample_width, channels * sample_width, sample_width * 8,
+                       b"data", data_size)
+
+
+def to_wav(samples, frame_rate: int=FRAME_RATE, sample_width: int=SAMPLE_WIDTH) -> bytes:
+    """WAV file of 16-bit samples in memory
+
+    Parameters
+    ----------
+    samples : np.array or list of np.array
+        Interleaved samples of shape (frames, channels), or consecutive chunks of them.
+    frame_rate: int
+        Sampling rate of the samples.
+    sample_width: int
+        Bytes per sample in the file, one of SAMPLE_WIDTHS. 1 keeps the high byte of each sample.
+
+    Returns
+    -------
+    bytes
+        The header and the samples, copied once into the result.
+    """
+    assert sample_width in SAMPLE_WIDTHS, "sample_width must be one of {}".format(SAMPLE_WIDTHS)
+    chunks = [__pcm(chunk, sample_width) for chunk in ([samples] if isinstance(samples, np.ndarray) else samples)]
+    header = wav_header(sum(len(chunk) for chunk in chunks), frame_rate, chunks[0].shape[1], sample_width)
+    return b"".join([header] + chunks)
+
+
+def as_array(segment) -> np.array:
+    """Samples of an AudioSegment of shape (frames, channels) without copying them"""
+    dtype = {1: np.int8, 2: np.int16, 4: np.int32}[segment.sample_width]
+    return np.frombuffer(segment.raw_data, dtype=dtype).reshape(-1, segment.channels)
+
+
+def format_of(path: str) -> str:
+    """Format of the file from its extension, wav by default"""
+    extension = os.path.splitext(path)[1].lower().lstrip(".")
+    return extension if extension in FORMATS else "wav"
+
+
+def write(path: str, chunks, frame_rate: int=FRAME_RATE, channels: int=2, format: str=None,
+        sample_width: int=SAMPLE_WIDTH):
+    """Write chunks of 16-bit samples to an audio file as they arrive
+
+    Parameters
+    ----------
+    path : str
+        Path of the audio file.
+    chunks : iterable
+        Arrays of interleaved 16-bit samples of shape (frames, channels).
+    frame_rate: int
+        Sampling rate of the samples.
+    channels: int
+        Number of channels of the samples.
+    format: str
+        One of FORMATS. The compressed formats need the soundfile package.
+        Default is the extension of the path, or wav.
+    sample_width: int
+        Bytes per sample of wav and flac files, one of SAMPLE_WIDTHS.
+        The lossy formats choose their own precision.
+    """
+    format = format_of(path) if format is None else format
+    assert format in FORMATS, "format must be one of {}".format(FORMATS)
+    assert sample_width in SAMPLE_WIDTHS, "sample_width must be one of {}".format(SAMPLE_WIDTHS)
+
+    if format == "wav":
+        with wave.open(path, "wb") as f:
+            f.setnchannels(channels)
+            f.setsampwidth(sample_width)
+            f.setframerate(frame_rate)
+            for chunk in chunks:
+                # written through the buffer protocol, so 16-bit samples are not copied
+                f.writeframes(__pcm(chunk, sample_width))
+        return
+
+    try:
+        import soundfile
+    except ImportError:
+        raise ImportError("soundfile is required to write {} files: pip install audio-plot-lib[compressed]".format(
+            format))
+
+    container, subtype = COMPRESSED_FORMATS[format]
+    if format == "flac" and sample_width == 1:
+        subtype = "PCM_S8"
+    with soundfile.SoundFile(path, "w", samplerate=frame_rate, channels=channels, format=container,
+                             subtype=subtype) as f:
+        for chunk in chunks:
+            f.write(np.asarray(chunk, dtype=np.int16))
+
+
+def memmap(path: str, mode: str="r") -> np.memmap:
+    """Samples of a 16-bit PCM WAV file mapped into memory
+
+    Long renders can be written with write and then read or edited in place
+    without loading the whole file.
+
+    Parameters
+    ----------
+    path : str
+        Path of the WAV file.
+    mode: str
+        "r" (default) for read only, or "r+" to modify the samples in the file.
+
+    Returns
+    -------
+    np.memmap
+        Interleaved samples of shape (frames, channels).
+    """
+    with wave.open(path, "rb") as f:
+        assert f.getsampwidth() == SAMPLE_WIDTH, "only 16-bit WAV files can be mapped"
+        channels = f.getnchannels()
+        n_frames = f.getnframes()
+
+    # the samples follow the header of the data chunk, which is usually the first chunk after fmt
+    with open(path, "rb") as f:
+        f.seek(12)
+        while True:
+            name, size = struct.unpack("<4sI", f.read(8))
+            if name == b"data":
+                offset = f.tell()
+                break
+            f.seek(size + size % 2, os.SEEK_CUR)
+
+    if n_frames == 0:
+        return np.zeros((0, channels), dtype="<i2")
+    return np.memmap(path, dtype="<i2", mode=mode, offset=offset, shape=(n_frames, channels))
@@ -1,11 +1,13 @@
 import copy
+import json
+import os
 import numpy as np
 from bokeh import events
 from bokeh.models import CustomJS, HoverTool, Slider, Div
+from bokeh.models import CDSView, ColumnDataSource, GroupFilter, LinearColorMapper
 from bokeh.plotting import figure, output_notebook, show
 from bokeh.layouts import column, row
 from bokeh.models import LinearAxis, Range1d
-from IPython.display import HTML, display
 
 language = "en"
 
@@ -23,31 +25,276 @@ def set_language(lang: str):
     language = lang
 
 
+__RUNTIME_JS = """
+if (typeof window.audioPlotLib === 'undefined') {
+    window.audioPlotLib = (function() {
+        const lib = {target: 0, context: null};
+
+        // one oscillator, panner and gain shared by all plots of the page
+        lib.start = function() {
+            if (lib.context !== null) {
+                return;
+            }
+            lib.context = new (window.AudioContext || window.webkitAudioContext)();
+            lib.gain = lib.context.createGain();
+            lib.panner = lib.context.createStereoPanner();
+            lib.osc = lib.context.createOscillator();
+            lib.osc.connect(lib.panner);
+            lib.panner.connect(lib.gain);
+            lib.gain.connect(lib.context.destination);
+            lib.osc.start(lib.context.currentTime);
+            lib.gain.gain.setValueAtTime(0, lib.context.currentTime);
+
+            // tones of an audio sprite are played one at a time through their own panner and gain
+            lib.voice = null;
+            lib.spriteGain = lib.context.createGain();
+            lib.spritePanner = lib.context.createStereoPanner();
+            lib.spritePanner.connect(lib.spriteGain);
+            lib.spriteGain.connect(lib.context.destination);
+        };
+
+        lib.speak = function(text, lang) {
+            window.speechSynthesis.cancel();
+            const msg = new SpeechSynthesisUtterance(text);
+            msg.lang = lang;
+            window.speechSynthesis.speak(msg);
+        };
+
+        // replace {name} in the template with values.name
+        lib.format = function(template, values) {
+            return template.replace(/\\{(\\w+)\\}/g, function(match, name) {
+                return (name in values) ? values[name] : match;
+            });
+        };
+
+        // index of the nearest point of the target label, or -1
+        // x is sorted by label and x, and the points of a label are in offsets[label] ~ offsets[label + 1]
+        lib.find = function(source, offsets, ranges, position, multiAxes) {
+            const x = source.data.x;
+            // the points may still be loading from a sidecar file
+            if ((lib.target + 1 >= offsets.length) || (x.length < offsets[offsets.length - 1])) {
+                return -1;
+            }
+
+            const rangeIdx = (multiAxes ? lib.target : offsets.length - 1) * 4;
+            if ((position == Infinity) || (position < ranges[rangeIdx]) || (position > ranges[rangeIdx + 1])) {
+                return -1;
+            }
+
+            // binary search of the first point on the right of the position
+            const first = offsets[lib.target];
+            const last = offsets[lib.target + 1] - 1;
+            let lo = first;
+            let hi = last + 1;
+            while (lo < hi) {
+                const mid = (lo + hi) >>> 1;
+                if (x[mid] <= position) {
+                    lo = mid + 1;
+                } else {
+                    hi = mid;
+                }
+            }
+
+            if (lo > last) {
+                return last;
+            } else if (lo == first) {
+                return first;
+            }
+            return (position - x[lo - 1] < x[lo] - position) ? lo - 1 : lo;
+        };
+
+        // the 16-bit tones of a sprite are converted once into an AudioBuffer, kept with the sprite
+        lib.buffer = function(sprite) {
+            if (!sprite.audioBuffer) {
+                const samples = sprite.data.samples;
+                const buffer = lib.context.createBuffer(1, samples.length, sprite.tags[0]);
+                const channel = buffer.getChannelData(0);
+                for (let i = 0; i < samples.length; i++) {
+                    channel[i] = samples[i] / 32768;
+                }
+                sprite.audioBuffer = buffer;
+            }
+            return sprite.audioBuffer;
+        };
+
+        // frequency and pan of each point are computed in advance, and its tone in a sprite if any
+        lib.play = function(source, idx, gain, sprite) {
+            if (lib.context === null) {
+                return;
+            }
+            const now = lib.context.currentTime;
+            if (sprite) {
+                const rate = sprite.tags[0];
+                const frames = sprite.tags[1];
+                if (lib.voice !== null) {
+                    lib.voice.stop(now);
+                }
+                lib.voice = lib.context.createBufferSource();
+                lib.voice.buffer = lib.buffer(sprite);
+                lib.voice.connect(lib.spritePanner);
+                lib.spritePanner.pan.setValueAtTime(source.data.pan[idx], now);
+                lib.spriteGain.gain.setValueAtTime(gain, now);
+                lib.voice.start(now, source.data.tone[idx] * frames / rate, frames / rate);
+                return;
+            }
+            lib.osc.type = 'triangle'; // sine, square, sawtooth, triangle
+            lib.osc.frequency.value = source.data.freq[idx]; // Hz
+            lib.gain.gain.linearRampToValueAtTime(gain, now + 0.2); // atack
+            lib.gain.gain.setTargetAtTime(0, now + 0.2, 0.5); // decay, sustain
+            lib.panner.pan.value = source.data.pan[idx]; // left:-1 ~ right:1
+        };
+
+        // handled at most once per animation frame and only when the nearest point changes
+        lib.hover = function(source, offsets, ranges, position, marginX, multiAxes, gain, sprite) {
+            const state = source.hoverState || (source.hoverState = {position: null, frame: 0, lastIdx: -1, lastTarget: -1});
+            state.position = position;
+            if (state.frame) {
+                return;
+            }
+
+            state.frame = requestAnimationFrame(function() {
+                state.frame = 0;
+                const idx = lib.find(source, offsets, ranges, state.position, multiAxes);
+                if ((idx < 0) || (Math.abs(state.position - source.data.x[idx]) > marginX)) {
+                    // the same point plays again when the cursor comes back to it
+                    state.lastIdx = -1;
+                    return;
+                }
+                if ((idx == state.lastIdx) && (lib.target == state.lastTarget)) {
+                    return;
+                }
+                state.lastIdx = idx;
+                state.lastTarget = lib.target;
+                lib.play(source, idx, gain, sprite);
+            });
+        };
+
+        lib.leave = function(source) {
+            if (source.hoverState) {
+                source.hoverState.lastIdx = -1;
+            }
+        };
+
+        lib.tap = function(source, offsets, ranges, position, multiAxes, template, lang) {
+            const idx = lib.find(source, offsets, ranges, position, multiAxes);
+            if (idx < 0) {
+                return;
+            }
+            lib.speak(lib.format(template, {x: source.data.x[idx], y: source.data.y[idx]}), lang);
+        };
+
+        lib.slide = function(source, offsets, ranges, position, target, marginX, multiAxes, gain, template, lang,
+                             sprite) {
+            lib.target = target;
+            const idx = lib.find(source, offsets, ranges, position, multiAxes);
+            if ((idx < 0) || (Math.abs(position - source.data.x[idx]) > marginX)) {
+                return;
+            }
+            lib.play(source, idx, gain, sprite);
+            setTimeout(function() {
+                lib.speak(lib.format(template, {x: source.data.x[idx], y: source.data.y[idx]}), lang);
+            }, 3000);
+        };
+
+        lib.nextLabel = function(maxLabel, template, lang) {
+            lib.target = (lib.target + 1) % (maxLabel + 1);
+            lib.speak(lib.format(template, {label: lib.target}), lang);
+        };
+
+        return lib;
+    })();
+}
+"""
+
+
+__SOURCE_NAME = "audio_plot_lib_points"
+__SPRITE_NAME = "audio_plot_lib_sprite"
+# length of each tone of an audio sprite in msec
+__SPRITE_DURATION = 150
+# dtypes sent to the browser as they are, others are sent as float64
+__JS_DTYPES = ["float32", "float64", "int8", "int16", "int32", "uint8", "uint16", "uint32"]
+
+__UNMUTE_JS = """
+document.getElementById('unmuteButton').addEventListener('click', function() {
+    audioPlotLib.start();
+    audioPlotLib.target = 0;
+});
+"""
+
+# fetch the points in parallel with the rendering, and hand them to the data source once it exists
+__SIDECAR_JS = """
+(function() {
+    const types = {float32: Float32Array, float64: Float64Array, int8: Int8Array, int16: Int16Array,
+                   int32: Int32Array, uint8: Uint8Array, uint16: Uint16Array, uint32: Uint32Array};
+    const buffer = fetch(%s).then(function(response) {
+        return response.arrayBuffer();
+    });
+
+    function load() {
+        const doc = window.Bokeh && Bokeh.documents && Bokeh.documents[0];
+        const source = doc && doc.get_model_by_name(%s);
+        if (!source) {
+            setTimeout(load, 50);
+            return;
+        }
+        buffer.then(function(data) {
+            const columns = {};
+            for (const column of %s) {
+                columns[column.name] = new types[column.dtype](data, column.offset, column.length);
+            }
+            source.data = columns;
+        });
+    }
+    load();
+})();
+"""
+
+__TEMPLATE = """
+{% extends "file.html.jinja" %}
+{% block inner_body %}
+  {{ button }}
+  <script>
+  {{ runtime }}
+  </script>
+  {{ super() }}
+  {% if sidecar %}
+  <script>
+  {{ sidecar }}
+  </script>
+  {% endif %}
+{% endblock %}
+"""
+
+
+# whether the runtime has been sent to the notebook of this kernel
+__runtime_displayed = False
+
+
 def __set_context():
-    display(HTML('''
+    from IPython.display import HTML, display
+    global __runtime_displayed
+
+    # the runtime is sent only once per kernel, and every callback calls into it
+    runtime = "" if __runtime_displayed else __RUNTIME_JS
+    __runtime_displayed = True
+    display(HTML("""
     <script>
-    if (typeof osc === 'undefined') {
-        audioContext = new (window.AudioContext || window.webkitAudioContext)();
-        audioGain = audioContext.createGain();
-        panNode = audioContext.createStereoPanner();
-        osc = audioContext.createOscillator();
-        osc.connect(panNode);
-        panNode.connect(audioGain);
-        audioGain.connect(audioContext.destination);
-        osc.start(audioContext.currentTime);
-        audioGain.gain.setValueAtTime(0, audioContext.currentTime);
+    %s
+    if (window.audioPlotLib) {
+        audioPlotLib.start();
+        audioPlotLib.target = 0;
     }
-    oscTarget = 0;
-    '''))
+    </script>
+    """ % runtime))
+
+
+def __call_js(function, *args):
+    # a short call into the runtime, which does nothing on a page without it
+    return "if (window.audioPlotLib) { audioPlotLib.%s(%s); }" % (function, ", ".join(args))
 
 
-def __speak_js(utterance):
-    return """
-        window.speechSynthesis.cancel();
-        let msg = new SpeechSynthesisUtterance({});
-        msg.lang = '{}';
-        window.speechSynthesis.speak(msg);
-        """.format(utterance, "ja-JP" if language == "ja" else "en-US")
+def __lang_js():
+    return json.dumps("ja-JP" if language == "ja" else "en-US")
 
 
 def __speak_inout(title="image", enter=True, read_label=False):
@@ -64,213 +311,223 @@ def __speak_inout(title="image", enter=True, read_label=False):
 
     if read_label and enter:
         if language == "ja":
-            label_message = "。ラベル ${oscTarget} を選択中。ダブルクリックで変更できます。"
+            label_message = "。ラベル {label} を選択中。ダブルクリックで変更できます。"
         else:
-            label_message = ". Label ${oscTarget} is selected. Double click to change."
+            label_message = ". Label {label} is selected. Double click to change."
     else:
         label_message = ""
 
-    return CustomJS(code=__speak_js("`{}`".format(inout_message + label_message)))
-
-
-__FIND_NEAREST_JS = """
-var minX, maxX, minY, maxY;
-if(multiAxes) {
-  var labeledX = [];
-  var labeledY = [];
-  x.forEach(function(val, idx){
-      if(label[idx] != oscTarget) { return; }
-      labeledX.push(x[idx]);
-      labeledY.push(y[idx]);
-  });
-  minX = Math.min(...labeledX);
-  maxX = Math.max(...labeledX);
-  minY = Math.min(...labeledY);
-  maxY = Math.max(...labeledY);
-} else {
-  minX = Math.min(...x);
-  maxX = Math.max(...x);
-  minY = Math.min(...y);
-  maxY = Math.max(...y);
-}
+    text = "audioPlotLib.format(%s, {label: audioPlotLib.target})" % json.dumps(inout_message + label_message)
+    return CustomJS(code=__call_js("speak", text, __lang_js()))
 
-if((position == Infinity) || (position < minX) || (position > maxX)) {
-    return;
-}
 
-var diff = [];
-var nearestIdx = 0;
-x.forEach(function(val, idx){
-    if(label[idx] != oscTarget) {
-        return;
-    }
-    diff[idx] = Math.abs(position - val);
-    nearestIdx = (diff[nearestIdx] < diff[idx]) ? nearestIdx : idx;
-});
+def __js_array(values):
+    """values as a one-dimensional array of a dtype which JavaScript has a typed array for
 
-let nearestX = x[nearestIdx];
-let nearestY = y[nearestIdx];
-"""
+    Arrays, memmaps and pandas columns of such a dtype are used as they are, without a copy.
+    """
+    values = np.asarray(values).reshape(-1)
+    if values.dtype.name in __JS_DTYPES and values.dtype.isnative:
+        return values
+    return values.astype(np.float64)
 
 
-__COLORS = ['#1f77b4', '#ff7f0e', '#2ca02c', '#d62728',
-        '#9467bd', '#8c564b', '#e377c2', '#7f7f7f',
-        '#bcbd22', '#17becf']
+def __lookup(x, y, label):
+    """Data for the nearest point search of the runtime
 
+    Returns x, y and label sorted by label and x, the offsets of each label in them,
+    and minX, maxX, minY, maxY of each label followed by those of all points.
+    The points are partitioned by label once, and every later stage reuses the offsets.
+    """
+    x = __js_array(x)
+    y = __js_array(y)
+    label = np.asarray(label).reshape(-1)
+    if label.dtype.kind not in "iu":
+        label = label.astype(np.int64)
+
+    counts = np.bincount(label)
+    assert len(counts) <= len(__COLORS), "max label must be lower {}".format(len(__COLORS))
+    assert np.all(counts > 0), "label should be in {} because max label is {}.".format(
+                list(range(len(counts))), len(counts) - 1)
+    offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int32)
+
+    # points already sorted by label and x, e.g. a single series, are kept without a copy
+    step = label[1:] > label[:-1]
+    if not np.all(step | ((label[1:] == label[:-1]) & (x[1:] >= x[:-1]))):
+        order = np.lexsort((x, label))
+        x = x[order]
+        y = y[order]
+        label = label[order]
+
+    starts = offsets[:-1]
+    ranges = np.stack([x[starts], x[offsets[1:] - 1], np.minimum.reduceat(y, starts), np.maximum.reduceat(y, starts)],
+                      axis=1)
+    # the ranges are float64, so the pitch and pan of integer points do not wrap around
+    ranges = np.concatenate([ranges, [[x.min(), x.max(), y.min(), y.max()]]]).reshape(-1).astype(np.float64)
+
+    return {"x": x, "y": y, "label": label.astype(np.int32, copy=False), "offsets": offsets, "ranges": ranges}
+
+
+def __sound(x, y, label, ranges, multiple_axes):
+    """Frequency and pan of each point, played by the sound of the callbacks
+
+    The pitch and the pan are relative to the range of the label with multiple axes, otherwise to all points.
+    """
+    ranges = ranges.reshape((-1, 4))
+    min_x, max_x, min_y, max_y = ranges[label if multiple_axes else -1].T
 
-def plot(y: list, x: list=None, label: list=None, width: int=400, height: int=400, gain: float=0.4,
-        margin_x: int=1, title: str="graph", script_name: str="", slider_partitions: int=None,
-        multiple_axes=False):
-    """Plots that represent data with sound and can be checked interactively
+    with np.errstate(divide="ignore", invalid="ignore"):
+        freq = np.where(max_y > min_y, 261.626 + (y - min_y) / (max_y - min_y) * 261.626, 261.626)  # Hz
+        pan = np.where(max_x > min_x, (x - min_x) / (max_x - min_x) * 2 - 1, 0)  # left:-1 ~ right:1
 
-    You can interactively check the data in graph form by moving the mouse cursor.
-    When you enter or leave the graph image, you will be notified by voice.
-    Also, when you move the mouse left or right on the graph image,
-    the y-axis value corresponding to that location will be expressed with a high or low tone.
-    A single click will read out the value corresponding to that location.
-    Also, double-clicking switches the group according to the label specified as an option.
+    return {"freq": freq.astype(np.float32), "pan": pan.astype(np.float32)}
 
-    Parameters
-    ----------
-    y : list
-        A list of values to be graphed.
-    x : list
-        A list of x-axis values corresponding to y-axis values.
-        If not specified, it is substituted by the value of the equal interval. Optional.
-    label : list
-        A list of grouping numbers for each value, which must start with zero.
-        You can compare the graph data by sound, switching between each number. Optional.
-    width : int
-        Width of the graph image (in pixels). Optional.
-    height : int
-        Height of the graph image (in pixels). Optional.
-    title: str
-        Graph name to be read out. Optional.
-    multiple_axes: bool
-        Set to True if you want each label to have a separate y-axis. Optional.
 
-    Examples
-    --------
-    >>> plot([0, 1, 2])
-    <IPython.core.display.HTML object>
-    >>> plot(x=[0, 1, 2], y=[4, 5, 6], label=[0, 0, 1])
-    <IPython.core.display.HTML object>
+def __envelope(x, y, label, n_columns):
+    """Minimum and maximum y of each label in each of n_columns pixel columns
+
+    x, y and label must be sorted by label and x as returned by __lookup.
     """
+    min_x, max_x = np.float64(x.min()), np.float64(x.max())
+    scale = n_columns / (max_x - min_x) if max_x > min_x else 0
+    column = np.minimum((x - min_x) * scale, n_columns - 1).astype(np.int64)
 
-    if type(y) == np.ndarray:
-        y = y.tolist()
+    # the keys are sorted because the points are sorted by label and x
+    key = label.astype(np.int64) * n_columns + column
+    starts = np.flatnonzero(np.diff(key, prepend=-1))
+    centers = min_x + (column[starts] + 0.5) / scale if scale else x[starts]
 
-    if type(x) == np.ndarray:
-        x = x.tolist()
-    elif x == None:
-        x = np.arange(len(y)).tolist()
+    return {"x": centers, "y0": np.minimum.reduceat(y, starts), "y1": np.maximum.reduceat(y, starts),
+            "label": label[starts]}
 
-    if type(label) == np.ndarray:
-        label = label.astype(int).tolist()
-    elif label == None:
-        label = np.zeros_like(y).astype(int).tolist()
 
-    if label:
-        assert max(label) < len(__COLORS), "max label must be lower {}".format(len(__COLORS))
-        assert max(label) + 1 == len(set(label)), "label should be in {} because max label is {}.".format(
-                    list(range(max(label) + 1)), max(label))
+__COLORS = ['#1f77b4', '#ff7f0e', '#2ca02c', '#d62728',
+        '#9467bd', '#8c564b', '#e377c2', '#7f7f7f',
+        '#bcbd22', '#17becf']
 
-    if script_name == "":
-        __set_context()
-        output_notebook()
+
+def __sprite(x, label, freq, ranges, n_bins, multiple_axes):
+    """Tone of each point and the audio sprite of the tones
+
+    The points of each label are binned by x, and each bin is played as one tone
+    at the mean frequency of its points. Bins of the same frequency share a tone.
+    The tones are rendered by the synthesis of playable as mono 16-bit samples, one after another.
+    x, label and freq must be sorted by label and x as returned by __lookup.
+    """
+    from . import synthesis
+
+    ranges = ranges.reshape((-1, 4))
+    min_x, max_x = ranges[label if multiple_axes else -1, :2].T
+    with np.errstate(divide="ignore", invalid="ignore"):
+        position = np.where(max_x > min_x, (x - min_x) / (max_x - min_x), 0)
+    column = np.minimum(position * n_bins, n_bins - 1).astype(np.int64)
+
+    # the keys are sorted because the points are sorted by label and x
+    key = label.astype(np.int64) * n_bins + column
+    starts = np.flatnonzero(np.diff(key, prepend=-1))
+    counts = np.diff(np.append(starts, len(key)))
+    freqs, tones = np.unique(np.add.reduceat(freq.astype(np.float64), starts) / counts, return_inverse=True)
+
+    frame_rate = synthesis.QUALITIES["preview"][0]
+    samples = np.concatenate(list(synthesis.iter_envelopes(freqs, __SPRITE_DURATION, -3, int(__SPRITE_DURATION/4),
+                                                           "triangle", frame_rate)))
+    sprite = ColumnDataSource(data={"samples": samples.reshape(-1)}, name=__SPRITE_NAME,
+                              tags=[frame_rate, samples.shape[1]])
+    return np.repeat(tones, counts).astype(np.int32), sprite
+
+
+def __layout(y, x, label, width, height, gain, margin_x, title, slider_partitions, multiple_axes, lod_threshold,
+        sprite_bins=None):
+    """Bokeh layout of the graph, the sliders and the messages with the callbacks into the runtime"""
+    y = np.asarray(y).reshape(-1)
+    x = np.arange(len(y), dtype=np.int32) if x is None else x
+    label = np.zeros(len(y), dtype=np.int32) if label is None else label
+
+    # the glyphs and all callbacks share one copy of the data
+    lookup = __lookup(x, y, label)
+    data = {"x": lookup.pop("x"), "y": lookup.pop("y"), "label": lookup.pop("label")}
+    data.update(__sound(data["x"], data["y"], data["label"], lookup["ranges"], multiple_axes))
+    if sprite_bins is not None:
+        data["tone"], lookup["sprite"] = __sprite(data["x"], data["label"], data["freq"], lookup["ranges"],
+                                                  sprite_bins, multiple_axes)
+    source = ColumnDataSource(data=data, name=__SOURCE_NAME)
+    lookup["source"] = source
+    offsets, ranges = lookup["offsets"], lookup["ranges"].reshape((-1, 4))
+    max_label = len(offsets) - 2
 
     plot = figure(width=width, height=height, tools="", toolbar_location=None)
-    colors = [__COLORS[c] for c in label]
+    color = {"field": "label", "transform": LinearColorMapper(palette=__COLORS[:max_label + 1], low=0, high=max_label + 1)}
+
+    if len(y) > lod_threshold:
+        # level of detail: draw only the envelope of each pixel column
+        plot.output_backend = "webgl"
+        glyph_source = ColumnDataSource(data=__envelope(source.data["x"], source.data["y"], source.data["label"], width))
+
+        def draw(**kwargs):
+            plot.segment("x", "y0", "x", "y1", source=glyph_source, line_color=color, line_width=2,
+                         line_cap="round", **kwargs)
+    else:
+        glyph_source = source
+
+        def draw(**kwargs):
+            plot.scatter("x", "y", source=source, line_color=color, fill_color=color, **kwargs)
 
     if multiple_axes:
-        assert max(label) == 1, "The number of labels must be two kinds"
+        assert max_label == 1, "The number of labels must be two kinds"
 
         multi_axes_str = "true"
         y_ranges = {}
-        for l in range(max(label)+1):
-            __x = np.array(x)[np.array(label) == l].tolist()
-            __y = np.array(y)[np.array(label) == l].tolist()
-            __c = np.array(colors)[np.array(label) == l].tolist()
-            plot.scatter(__x, __y, line_color=__c, fill_color=__c, y_range_name=str(l))
+        for l in range(max_label+1):
+            draw(view=CDSView(filter=GroupFilter(column_name="label", group=l)), y_range_name=str(l))
             if l == 1:
                 plot.add_layout(LinearAxis(y_range_name=str(l)), 'right')
-            y_ranges[str(l)] = Range1d(start=min(__y) - 1, end=max(__y) + 1)
+            y_ranges[str(l)] = Range1d(start=ranges[l, 2] - 1, end=ranges[l, 3] + 1)
 
         plot.extra_y_ranges = y_ranges
 
     else:
         multi_axes_str = "false"
-        plot.scatter(x, y, line_color=colors, fill_color=colors)
+        draw()
 
-    sound_js = """
-    const multiAxes = %s;
-    %s
-    if(diff[nearestIdx] > marginX) {
-        return;
-    }
-
-    const gain = %s; // max: 1.0
-    osc.type = 'triangle'; // sine, square, sawtooth, triangle
-    osc.frequency.value = 261.626 + (nearestY - minY) / (maxY - minY) * 261.626 // Hz
-    audioGain.gain.linearRampToValueAtTime(gain, audioContext.currentTime + 0.2); // atack
-    audioGain.gain.setTargetAtTime(0, audioContext.currentTime + 0.2, 0.5); // decay, sustain
-
-    let pan = (nearestX - minX) / (maxX - minX) * 2 - 1;
-    panNode.pan.value = pan;  // left:-1 ~ right:1
-    """ % (multi_axes_str, __FIND_NEAREST_JS, gain)
+    args = ["source", "offsets", "ranges"]
 
     # Mouse hover on plot
-    hover_code = """
-    let marginX = %s;
-    let position = cb_data.geometry.x;
-    %s
-    """ % (margin_x, sound_js)
-
-    callback = CustomJS(args={"x": x, "y": y, "label": label}, code=hover_code)
-    plot.add_tools(HoverTool(tooltips=None, callback=callback))
+    sprite_args = [] if sprite_bins is None else ["sprite"]
+    hover_code = __call_js("hover", *args, "cb_data.geometry.x", str(margin_x), multi_axes_str, str(gain), *sprite_args)
+    plot.add_tools(HoverTool(tooltips=None, callback=CustomJS(args=lookup, code=hover_code)))
 
     # Single tap on plot
     if language == "ja":
-        utterance = "`エックスは${nearestX}。ワイは${nearestY}`"
+        value_message = json.dumps("エックスは{x}。ワイは{y}")
     else:
-        utterance = "`X is ${nearestX}. Y is ${nearestY}`"
+        value_message = json.dumps("X is {x}. Y is {y}")
 
-    tap_code = """
-    let position = cb_obj.x;
-    const multiAxes = %s;
-    %s
-    %s
-    """ % (multi_axes_str, __FIND_NEAREST_JS, __speak_js(utterance))
+    tap_code = __call_js("tap", *args, "cb_obj.x", multi_axes_str, value_message, __lang_js())
+    plot.js_on_event(events.Tap, CustomJS(args=lookup, code=tap_code))
 
-    plot.js_on_event(events.Tap, CustomJS(args={"x": x, "y": y, "label": label},
-                                       code=tap_code))
-
-    if len(set(label)) > 1:
+    if max_label > 0:
         # Double tap on plot
         if language == "ja":
-            utterance = "`ラベル ${oscTarget} が選択されています。`"
+            label_message = json.dumps("ラベル {label} が選択されています。")
         else:
-            utterance = "`label ${oscTarget} is selected`"
+            label_message = json.dumps("label {label} is selected")
 
-        double_tap_code = """
-        oscTarget = (oscTarget + 1) %% (maxLabel + 1);
-        %s
-        """ % (__speak_js(utterance))
-        plot.js_on_event(events.DoubleTap, CustomJS(args={"maxLabel": max(label)},
-                                                 code=double_tap_code))
+        double_tap_code = __call_js("nextLabel", str(max_label), label_message, __lang_js())
+        plot.js_on_event(events.DoubleTap, CustomJS(code=double_tap_code))
 
     # Enter or leave on plot
-    read_label = (max(label) > 0)
+    read_label = (max_label > 0)
     plot.js_on_event(events.MouseEnter, __speak_inout(title, True, read_label))
     plot.js_on_event(events.MouseLeave, __speak_inout(title, False, read_label))
+    plot.js_on_event(events.MouseLeave, CustomJS(args={"source": source}, code=__call_js("leave", "source")))
 
     # slider for keyboard interaction
     sliders = []
-    for l in range(max(label)+1):
-        __x = np.array(x)[np.array(label) == l].tolist()
+    for l in range(max_label+1):
+        n_points = offsets[l + 1] - offsets[l]
 
         if slider_partitions is None:
-            slider_partitions = np.min([len(__x)-1, 30])
+            slider_partitions = np.min([n_points-1, 30])
             if slider_partitions == 30:
                 if language == "ja":
                     print("30個以上のデータがあるため、それ以上の細かさが省略されています。"\
@@ -279,28 +536,18 @@ def plot(y: list, x: list=None, label: list=None, width: int=400, height: int=40
                     print("The number of slider partitions has been reduced to 30 as the default limit. "\
                           "Please set slider_partitions as an argument if necessary.")
 
-        slider_start = np.min(__x)
-        slider_end = np.max(__x)
+        slider_start = float(ranges[l, 0])
+        slider_end = float(ranges[l, 1])
         if slider_start == slider_end:
             slider_end += 1
         slider_step = (slider_end - slider_start) / slider_partitions
 
-        if language == "ja":
-            utterance = "`エックスは${nearestX}。ワイは${nearestY}`"
-        else:
-            utterance = "`X is ${nearestX}. Y is ${nearestY}`"
-
-        slider_code = """
-        oscTarget = target;
-        let marginX = %s;
-        let position = slider.value;
-        %s
-        setTimeout(function(){%s}, 3000);
-        """ % (slider_step, sound_js, __speak_js(utterance))
+        slider_code = __call_js("slide", *args, "cb_obj.value", str(l), str(slider_step), multi_axes_str, str(gain),
+                                value_message, __lang_js(), *sprite_args)
 
         slider = Slider(start=slider_start, end=slider_end, value=slider_start, step=slider_step,
                     title="{} {}".format("ラベル" if language == "ja" else "label", l))
-        slider.js_on_change('value', CustomJS(args={"x": x, "y": y, "label": label, "slider": slider, "target": l}, code=slider_code))
+        slider.js_on_change('value', CustomJS(args=lookup, code=slider_code))
         sliders.append(slider)
 
     # layout
@@ -315,37 +562,148 @@ def plot(y: list, x: list=None, label: list=None, width: int=400, height: int=40
             "If you have a mouse, you can check the values by hovering over the graph. "\
             "If you are using only a keyboard, you can move the slider to move the horizontal axis "\
             "of the graph to check the value of the graph as a pitch according to the location.</p>")
-    show(column(message1, message2, row(plot, column(sliders))))
+    return column(message1, message2, row(plot, column(sliders)))
 
-    if script_name != "":
-        from bs4 import BeautifulSoup
 
-        if language == "ja":
-            button = "<button id=\"unmuteButton\">このボタンを押して音声再生を有効化してください</button>"
-        else:
-            button = "<button id=\"unmuteButton\">Push here to unmute graph</button>"
-
-        script = """
-        <script>
-        document.getElementById('unmuteButton').addEventListener('click', function() {
-            audioContext = new (window.AudioContext || window.webkitAudioContext)();
-            audioGain = audioContext.createGain();
-            panNode = audioContext.createStereoPanner();
-            osc = audioContext.createOscillator();
-            osc.connect(panNode);
-            panNode.connect(audioGain);
-            audioGain.connect(audioContext.destination);
-            osc.start(audioContext.currentTime);
-            audioGain.gain.setValueAtTime(0, audioContext.currentTime);
-            oscTarget = 0;
-        })
-        </script>
-        """
-
-        html_filename = script_name.replace(".py", ".html")
-        soup = BeautifulSoup(open(html_filename), 'html.parser')
-        soup.body.insert(0, BeautifulSoup(button + script, "html.parser")) # after body
-
-        with open(html_filename, "w") as file:
-            file.write(str(soup))
+def plot(y: list, x: list=None, label: list=None, width: int=400, height: int=400, gain: float=0.4,
+        margin_x: int=1, title: str="graph", script_name: str="", slider_partitions: int=None,
+        multiple_axes=False, lod_threshold: int=100000, sprite_bins: int=None):
+    """Plots that represent data with sound and can be checked interactively
+
+    You can interactively check the data in graph form by moving the mouse cursor.
+    When you enter or leave the graph image, you will be notified by voice.
+    Also, when you move the mouse left or right on the graph image,
+    the y-axis value corresponding to that location will be expressed with a high or low tone.
+    A single click will read out the value corresponding to that location.
+    Also, double-clicking switches the group according to the label specified as an option.
+
+    Parameters
+    ----------
+    y : list
+        A list of values to be graphed.
+    x : list
+        A list of x-axis values corresponding to y-axis values.
+        If not specified, it is substituted by the value of the equal interval. Optional.
+    label : list
+        A list of grouping numbers for each value, which must start with zero.
+        You can compare the graph data by sound, switching between each number. Optional.
+    width : int
+        Width of the graph image (in pixels). Optional.
+    height : int
+        Height of the graph image (in pixels). Optional.
+    title: str
+        Graph name to be read out. Optional.
+    script_name: str
+        Name of the running script. If specified, the graph is saved next to it as an HTML file
+        and opened in a browser instead of being shown in the notebook. Optional.
+    multiple_axes: bool
+        Set to True if you want each label to have a separate y-axis. Optional.
+    lod_threshold: int
+        With more points than this, the graph is drawn as the minimum and maximum of each pixel column
+        with WebGL, while the sound and the read out values still use all the points.
+        Default is 100000.
+    sprite_bins: int
+        If set, the x range of each label is divided into this many bins, and a short tone of each bin
+        is rendered in advance into an audio sprite, which the page decodes once. Each hover or slider
+        move then starts the tone at its offset in the sprite, instead of retuning a shared oscillator,
+        so the feedback is sample accurate and its cost does not depend on the number of points. Optional.
+
+    Examples
+    --------
+    >>> plot([0, 1, 2])
+    <IPython.core.display.HTML object>
+    >>> plot(x=[0, 1, 2], y=[4, 5, 6], label=[0, 0, 1])
+    <IPython.core.display.HTML object>
+    """
+
+    if script_name == "":
+        __set_context()
+        output_notebook()
+        show(__layout(y, x, label, width, height, gain, margin_x, title, slider_partitions, multiple_axes,
+                      lod_threshold, sprite_bins))
+    else:
+        from bokeh.util.browser import view
+
+        view(save(script_name.replace(".py", ".html"), y, x=x, label=label, width=width, height=height, gain=gain,
+                  margin_x=margin_x, title=title, slider_partitions=slider_partitions,
+                  multiple_axes=multiple_axes, lod_threshold=lod_threshold, sprite_bins=sprite_bins))
+
+
+def __write_sidecar(path, source):
+    """Move the columns of the source into a binary file, and return their layout in it"""
+    columns = []
+    offset = 0
+    with open(path, "wb") as f:
+        for name, values in source.data.items():
+            values = np.ascontiguousarray(values, dtype=np.asarray(values).dtype.newbyteorder("<"))
+            columns.append({"name": name, "dtype": values.dtype.name, "offset": offset, "length": len(values)})
+            f.write(values.tobytes())
+            # typed arrays must be aligned to their element size
+            padding = -values.nbytes % 8
+            f.write(b"\0" * padding)
+            offset += values.nbytes + padding
+
+    source.data = {name: values[:0] for name, values in source.data.items()}
+    return columns
+
+
+def save(path: str, y: list, x: list=None, label: list=None, width: int=400, height: int=400, gain: float=0.4,
+        margin_x: int=1, title: str="graph", slider_partitions: int=None, multiple_axes=False,
+        lod_threshold: int=100000, sidecar: bool=False, resources: str="cdn", sprite_bins: int=None) -> str:
+    """Save the plot as a standalone HTML file
+
+    The page has a button to unmute the graph, because browsers allow audio only after a user action.
+    The parameters of the graph are the same as plot.
+
+    Parameters
+    ----------
+    path : str
+        HTML file to be written.
+    sidecar : bool
+        If True, the points are written to a binary file next to the HTML file (with the extension .bin),
+        which the page fetches after the graph is rendered, so large graphs open quickly.
+        Browsers fetch it only when the page is served over HTTP, e.g. by `python -m http.server`.
+        Default is False.
+    resources : str
+        "cdn" (default) to load BokehJS from the network, or "inline" to embed it in the file.
+    sprite_bins : int
+        Number of bins of each label rendered into an audio sprite, see plot. The sprite is kept
+        in the HTML file, also with sidecar. Optional.
+
+    Returns
+    -------
+    str
+        path
+
+    Examples
+    --------
+    >>> save("graph.html", [0, 1, 2])
+    'graph.html'
+    """
+    from bokeh.core.templates import get_env
+    from bokeh.embed import file_html
+
+    layout = __layout(y, x, label, width, height, gain, margin_x, title, slider_partitions, multiple_axes,
+                      lod_threshold, sprite_bins)
+
+    if language == "ja":
+        button = "<button id=\"unmuteButton\">このボタンを押して音声再生を有効化してください</button>"
+    else:
+        button = "<button id=\"unmuteButton\">Push here to unmute graph</button>"
+
+    sidecar_js = None
+    if sidecar:
+        source = layout.select_one({"name": __SOURCE_NAME})
+        sidecar_path = os.path.splitext(path)[0] + ".bin"
+        columns = __write_sidecar(sidecar_path, source)
+        sidecar_js = __SIDECAR_JS % (json.dumps(os.path.basename(sidecar_path)), json.dumps(__SOURCE_NAME),
+                                     json.dumps(columns))
+
+    html = file_html(layout, resources, title, template=get_env().from_string(__TEMPLATE),
+                     template_variables={"button": button, "runtime": __RUNTIME_JS + __UNMUTE_JS,
+                                         "sidecar": sidecar_js})
+
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(html)
 
+    return path
@@ -0,0 +1,388 @@
+import collections
+import contextlib
+import threading
+import time
+import wave
+import numpy as np
+from . import synthesis
+
+POLICIES = ["block", "drop_oldest", "drop_newest"]
+SCALINGS = ["adaptive", "fixed"]
+
+
+class RingBuffer:
+    """Fixed size FIFO of 16-bit frames shared by a producer and a consumer thread
+
+    Parameters
+    ----------
+    capacity: int
+        Maximum number of frames held, which bounds the latency through the buffer.
+    channels: int
+        Number of channels of the frames.
+    """
+
+    def __init__(self, capacity: int, channels: int=2):
+        self.buffer = np.zeros((capacity, channels), dtype=np.int16)
+        self.capacity = capacity
+        self.size = 0
+        # positions in the whole stream, frames dropped from the head are counted as read
+        self.written = 0
+        self.read_position = 0
+        self.closed = False
+        self.overwritten = None
+        self.__start = 0
+        self.__condition = threading.Condition()
+
+    def __put(self, samples):
+        end = (self.__start + self.size) % self.capacity
+        first = min(len(samples), self.capacity - end)
+        self.buffer[end:end + first] = samples[:first]
+        self.buffer[:len(samples) - first] = samples[first:]
+        self.size += len(samples)
+        self.written += len(samples)
+
+    def __drop(self, n_frames):
+        self.__start = (self.__start + n_frames) % self.capacity
+        self.size -= n_frames
+        self.read_position += n_frames
+
+    def __discard(self, n_frames, n_new, boundaries):
+        start = end = self.read_position
+        if boundaries is None:
+            end += n_frames
+        else:
+            # the frames are cut at the boundaries, and the rest of the frames being read is kept
+            # unless the new frames would not fit next to it
+            boundaries = sorted(b for b in boundaries if self.read_position <= b <= self.written)
+            if boundaries and boundaries[0] - self.read_position + n_new <= self.capacity:
+                start = boundaries[0]
+            end = next((b for b in boundaries if b >= start + n_frames), self.written)
+
+        # the kept frames are moved next to the frames after the cut, and take their stream positions
+        kept = (self.__start + np.arange(start - self.read_position)) % self.capacity
+        self.overwritten = (start, end)
+        self.__drop(end - start)
+        self.buffer[(self.__start + np.arange(len(kept))) % self.capacity] = self.buffer[kept]
+
+    def write(self, samples: np.array, policy: str="block", boundaries: list=None) -> int:
+        """Append frames, and return the number of the frames which were not written
+
+        "block" waits until the consumer makes room, "drop_oldest" discards the oldest unread frames
+        and sets their stream positions to `overwritten`, and "drop_newest" discards the samples
+        unless all of them fit. With boundaries, the stream positions where the frames can be cut,
+        "drop_oldest" discards whole spans between the boundaries instead.
+        """
+        dropped = 0
+        with self.__condition:
+            self.overwritten = None
+            if policy == "drop_newest":
+                if len(samples) > self.capacity - self.size:
+                    return len(samples)
+            elif policy == "drop_oldest":
+                if len(samples) > self.capacity:
+                    dropped += len(samples) - self.capacity
+                    samples = samples[-self.capacity:]
+                overflow = max(0, len(samples) - (self.capacity - self.size))
+                if overflow > 0:
+                    self.__discard(overflow, len(samples), boundaries)
+
+            while len(samples) > 0:
+                while self.size == self.capacity and not self.closed:
+                    self.__condition.wait()
+                if self.closed:
+                    return dropped + len(samples)
+
+                n = min(len(samples), self.capacity - self.size)
+                self.__put(samples[:n])
+                samples = samples[n:]
+                self.__condition.notify_all()
+
+        return dropped
+
+    def read(self, n_frames: int) -> np.array:
+        """Remove and return up to n_frames frames, waiting for at least one. None after close when empty."""
+        with self.__condition:
+            while self.size == 0 and not self.closed:
+                self.__condition.wait()
+            if self.size == 0:
+                return None
+
+            n = min(n_frames, self.size)
+            indices = (self.__start + np.arange(n)) % self.capacity
+            samples = self.buffer[indices]
+            self.__drop(n)
+            self.__condition.notify_all()
+            return samples
+
+    def close(self):
+        """Wake up the waiting threads. The frames left can still be read."""
+        with self.__condition:
+            self.closed = True
+            self.__condition.notify_all()
+
+
+class WavSink:
+    """Write the frames to a WAV file as they arrive"""
+
+    def __init__(self, path: str, frame_rate: int=synthesis.FRAME_RATE, channels: int=2):
+        self.file = wave.open(path, "wb")
+        self.file.setnchannels(channels)
+        self.file.setsampwidth(synthesis.SAMPLE_WIDTH)
+        self.file.setframerate(frame_rate)
+
+    def write(self, samples: np.array):
+        self.file.writeframes(np.ascontiguousarray(samples, dtype="<i2"))
+
+    def close(self):
+        self.file.close()
+
+
+class CallbackSink:
+    """Pass the frames to callback(samples), e.g. to send them over the network"""
+
+    def __init__(self, callback):
+        self.callback = callback
+
+    def write(self, samples: np.array):
+        self.callback(samples)
+
+    def close(self):
+        pass
+
+
+class DeviceSink:
+    """Stand-in for a local audio device which plays the frames in real time
+
+    Like a blocking write to a sound card, write returns only when the frames not yet played
+    fit in the buffer of the device. When no frames arrive in time the device plays silence,
+    which is counted as an underrun. The frames can be forwarded to another sink.
+
+    Parameters
+    ----------
+    sink
+        Sink which receives the frames as they are queued to the device. Optional.
+    frame_rate: int
+        Sampling rate of the device.
+    buffer: int
+        Length of the buffer of the device in msec.
+    """
+
+    def __init__(self, sink=None, frame_rate: int=synthesis.FRAME_RATE, buffer: int=50):
+        self.sink = sink
+        self.frame_rate = frame_rate
+        self.buffer_frames = int(frame_rate * buffer / 1000)
+        self.queued = 0
+        self.underruns = 0
+        self.__start = None
+
+    def write(self, samples: np.array):
+        now = time.perf_counter()
+        if self.__start is None:
+            self.__start = now
+        elif (now - self.__start) * self.frame_rate > self.queued:
+            # the device ran out of frames, and restarts from now
+            self.underruns += 1
+            self.__start = now - self.queued / self.frame_rate
+
+        self.queued += len(samples)
+        if self.sink is not None:
+            self.sink.write(samples)
+
+        wait = (self.queued - self.buffer_frames) / self.frame_rate - (now - self.__start)
+        if wait > 0:
+            time.sleep(wait)
+
+    def close(self):
+        # let the device play what is left in its buffer
+        if self.__start is not None:
+            wait = self.queued / self.frame_rate - (time.perf_counter() - self.__start)
+            if wait > 0:
+                time.sleep(wait)
+        if self.sink is not None:
+            self.sink.close()
+
+
+class LiveSonifier:
+    """Sonify values of a live feed as they arrive
+
+    Each value is synthesized into a note as soon as it is pushed, and the notes are
+    written to a ring buffer. A background thread moves the frames from the buffer to the sink.
+    The capacity of the buffer bounds the latency from a push to the sink. When the values
+    arrive faster than the sink consumes the notes, the policy decides what happens.
+
+    Parameters
+    ----------
+    sink
+        An object with write(samples) and close(), e.g. WavSink, CallbackSink or DeviceSink.
+        The samples are interleaved 16-bit stereo frames of shape (frames, 2).
+    duration: int
+        Length of each note in msec.
+        Default is 100 msec.
+    gain: float
+        Volume of the notes in dB.
+        Default is -5 dB.
+    min_freq: float
+        The lowest frequency, corresponding to the minimum value.
+        Default is 130.813 Hz
+    max_freq: float
+        The highest frequency, corresponding to the maximum value.
+        Default is 130.813*4 Hz
+    min_value: float
+        The value played at min_freq. Required for "fixed" scaling, and the initial guess for "adaptive".
+    max_value: float
+        The value played at max_freq. Required for "fixed" scaling, and the initial guess for "adaptive".
+    scaling: str
+        "adaptive" (default) maps the values with the range of the values seen so far,
+        "fixed" with min_value and max_value, clipping the values out of the range.
+    waveform: str
+        One of synthesis.WAVEFORMS.
+        Default is sine
+    latency: int
+        Capacity of the ring buffer in msec, at least the duration of a note.
+        Default is 500 msec.
+    policy: str
+        "block" (default) makes push wait until the note fits in the buffer,
+        "drop_oldest" discards the oldest whole notes not yet written to the sink
+        and "drop_newest" discards the new note.
+    period: int
+        Length of the chunks written to the sink in msec.
+        Default is 20 msec.
+
+    Examples
+    --------
+    >>> with LiveSonifier(DeviceSink(WavSink("feed.wav")), policy="drop_oldest") as sonifier:
+    ...     sonifier.feed(metrics())
+    >>> sonifier.dropped
+    0
+    """
+
+    def __init__(self, sink, duration: int=100, gain: float=-5, min_freq: float=130.813,
+                 max_freq: float=130.813*4, min_value: float=None, max_value: float=None, scaling: str="adaptive",
+                 waveform: str="sine", latency: int=500, policy: str="block", period: int=20):
+        assert scaling in SCALINGS, "scaling must be one of {}".format(SCALINGS)
+        assert policy in POLICIES, "policy must be one of {}".format(POLICIES)
+        assert waveform in synthesis.WAVEFORMS, "waveform must be one of {}".format(synthesis.WAVEFORMS)
+        if scaling == "fixed":
+            assert min_value is not None and max_value is not None, "fixed scaling needs min_value and max_value"
+        assert latency >= duration, "latency must be at least the duration of a note"
+
+        self.sink = sink
+        self.duration = duration
+        self.gain = gain
+        self.min_freq = min_freq
+        self.max_freq = max_freq
+        self.min_value = min_value
+        self.max_value = max_value
+        self.scaling = scaling
+        self.waveform = waveform
+        self.policy = policy
+
+        self.pushed = 0
+        self.dropped = 0
+        self.max_latency = 0.0
+
+        self.ring = RingBuffer(int(synthesis.FRAME_RATE * latency / 1000))
+        self.__period = max(1, int(synthesis.FRAME_RATE * period / 1000))
+        # stream positions of the start and end of each note queued, the time it was pushed and if it was dropped
+        self.__pending = collections.deque()
+        self.__lock = threading.Lock()
+        self.__thread = None
+
+    def freq(self, value: float) -> float:
+        """Frequency of the value with the current scaling"""
+        if np.isnan(value):
+            return np.nan
+
+        if self.scaling == "adaptive":
+            self.min_value = value if self.min_value is None else min(self.min_value, value)
+            self.max_value = value if self.max_value is None else max(self.max_value, value)
+
+        if self.max_value == self.min_value:
+            return (self.min_freq + self.max_freq) / 2
+
+        tic = (self.max_freq - self.min_freq) / (self.max_value - self.min_value)
+        return float(np.clip(self.min_freq + (value - self.min_value) * tic, self.min_freq, self.max_freq))
+
+    def start(self):
+        if self.__thread is None:
+            self.__thread = threading.Thread(target=self.__drain, name="audio_plot_lib_live", daemon=True)
+            self.__thread.start()
+        return self
+
+    def __drain(self):
+        while True:
+            samples = self.ring.read(self.__period)
+            if samples is None:
+                break
+            self.sink.write(samples)
+
+            now = time.perf_counter()
+            with self.__lock:
+                while self.__pending and self.__pending[0][1] <= self.ring.read_position:
+                    start, end, pushed_at, dropped = self.__pending.popleft()
+                    if not dropped:
+                        self.max_latency = max(self.max_latency, now - pushed_at)
+
+    def push(self, value: float):
+        """Synthesize the value into a note and queue it to the sink. NaN is played as silence."""
+        self.start()
+        pushed_at = time.perf_counter()
+        note = synthesis.render_notes([self.freq(float(value))], [0.0], self.duration, self.gain,
+                                      int(self.duration/4), self.waveform)
+
+        # only a blocking write waits for the drain thread, which needs the lock
+        with (self.__lock if self.policy != "block" else contextlib.nullcontext()):
+            start = self.ring.written
+            # the oldest notes are dropped whole, at the ends of the notes queued
+            boundaries = [entry[1] for entry in self.__pending] if self.policy == "drop_oldest" else None
+            lost = self.ring.write(note, self.policy, boundaries)
+
+            # the notes dropped are marked before the drain thread can pass them
+            if self.ring.overwritten is not None:
+                cut, end = self.ring.overwritten
+                for entry in self.__pending:
+                    if entry[0] >= cut and entry[1] <= end and not entry[3]:
+                        entry[3] = True
+                        self.dropped += 1
+                    elif entry[1] == cut:
+                        # the rest of the note being read now ends where the dropped notes ended
+                        entry[1] = end
+
+        with self.__lock:
+            self.pushed += 1
+            if lost:
+                self.dropped += 1
+                return
+            self.__pending.append([start, self.ring.written, pushed_at, False])
+
+    def feed(self, values):
+        """Push the values of an iterable until it is exhausted"""
+        for value in values:
+            self.push(value)
+
+    async def feed_async(self, queue):
+        """Push the values of an asyncio.Queue until None is received
+
+        Synthesis and a blocking push run in the default executor, so the event loop is not blocked.
+        """
+        import asyncio
+
+        loop = asyncio.get_running_loop()
+        while True:
+            value = await queue.get()
+            if value is None:
+                break
+            await loop.run_in_executor(None, self.push, value)
+
+    def close(self):
+        """Write the notes left in the ring buffer to the sink, and close it"""
+        self.ring.close()
+        if self.__thread is not None:
+            self.__thread.join()
+        self.sink.close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.close()
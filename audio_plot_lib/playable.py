@@ -1,62 +1,293 @@
-import copy
+import os
+import tempfile
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor
 import numpy as np
 from pydub import AudioSegment
-from pydub.generators import Sine, Pulse, Square, Sawtooth, Triangle, WhiteNoise
-from gtts import gTTS
-from IPython.display import Audio, display
+from pydub.generators import Sine
+from . import downsampling
+from . import encoding
+from . import synthesis
+from . import tts
+from .live import CallbackSink, DeviceSink, LiveSonifier, WavSink
+from .stats import RenderStats, measure
+from .synthesis import NoteBank
 
 
-def __tts(utter: str):
-    tts = gTTS(utter)
-    tts.save("tmp.mp3")
-    return AudioSegment.from_mp3("tmp.mp3")
+__SILENCE = AudioSegment.silent(duration=0)
 
 
-def __sample(freq: float):
-    return Sine(freq).to_audio_segment(duration=1000).apply_gain(-10).fade_in(20).fade_out(20)
+class RenderCache:
+    """Speech and notes kept between renders of a growing series, see PlotSession
 
+    The notes of each line are kept before panning, as the pan of every note
+    depends on the length of the series. They are reused as long as the earlier values
+    and the pitch mapping (the minimum, maximum and frequencies) are unchanged.
+    """
 
-def __overlay_plot(tones, lines, labels, min_freq, min_value, tic, duration, gains):
-    assert lines.shape[1] <= 5, "The maximum number of lines is 5. (lines.shape[1] <= 5)"
+    def __init__(self):
+        self.speech = {}
+        self.samples = {}
+        self.frames = {}
+        self.columns = {}
+        self.synthesized = 0
 
-    for t in range(lines.shape[1]):
-        tones += __tts("{} is {} sound".format(labels[t], ["Sine", "Pulse", "Square", "Sawtooth", "Triangle"][t]))
 
-    __tones = None
+def __tts(utter: str, speech: dict=None, stats: RenderStats=None):
+    with measure(stats, "speech") as stage:
+        if speech is not None and utter in speech:
+            segment = speech[utter].result()
+        else:
+            segment = tts.synthesize(utter)
+        stage.bytes = len(segment.raw_data)
+    return segment
+
+
+def __timbre_phrase(label, timbre):
+    return "{} is {} sound".format(label, timbre.capitalize())
+
+
+def __phrases(labels, ptype, timbres, min_value, max_value, decimals, description):
+    phrases = []
+    if description:
+        phrases += ["minimum value is {}".format(np.round(min_value, decimals)),
+                    "maximum value is {}".format(np.round(max_value, decimals))]
+
+    if ptype == "overlay":
+        phrases += [__timbre_phrase(label, timbre) for label, timbre in zip(labels, timbres)]
+    else:
+        phrases += list(labels)
+
+    return phrases
+
+
+def __quality(quality, frame_rate, channels, sample_width):
+    """Frame rate, channels and sample width of the quality, overridden by those which are set"""
+    assert quality in synthesis.QUALITIES, "quality must be one of {}".format(list(synthesis.QUALITIES))
+    defaults = synthesis.QUALITIES[quality]
+    frame_rate, channels, sample_width = [default if value is None else value
+                                          for default, value in zip(defaults, [frame_rate, channels, sample_width])]
+    assert channels in [1, 2], "channels must be 1 or 2"
+    assert sample_width in encoding.SAMPLE_WIDTHS, "sample_width must be one of {}".format(encoding.SAMPLE_WIDTHS)
+    return frame_rate, channels, sample_width
+
+
+def __sample(freq: float, cache: RenderCache=None, frame_rate: int=synthesis.FRAME_RATE):
+    key = (freq, frame_rate)
+    if cache is not None and key in cache.samples:
+        return cache.samples[key]
+
+    sample = Sine(freq, sample_rate=frame_rate).to_audio_segment(duration=1000).apply_gain(-10).fade_in(20).fade_out(20)
+    if cache is not None:
+        cache.samples[key] = sample
+    return sample
+
+
+def __cached_envelopes(values, t, min_freq, min_value, tic, duration, gain, fade, waveform, cache, stats, frame_rate,
+        bank):
+    """Notes of a line before panning, synthesizing only the values which are not in the cache"""
+    values = np.asarray(values)
+    key = (min_freq, min_value, tic, duration, gain, fade, waveform, frame_rate)
+    column = cache.columns.get(t)
+
+    # the notes are reused while the pitch mapping and the earlier values stay the same
+    if column is None or column["key"] != key or len(column["values"]) > len(values) or \
+            not np.array_equal(column["values"], values[:len(column["values"])], equal_nan=values.dtype.kind == "f"):
+        column = {"key": key, "values": values[:0],
+                  "envelopes": np.empty((0, synthesis.note_frames(duration, fade, frame_rate)), dtype=np.int16)}
+        cache.columns[t] = column
+
+    n = len(column["values"])
+    if n < len(values):
+        freqs = min_freq + (values[n:].astype(np.float64) - min_value) * tic
+        envelopes = np.concatenate(list(synthesis.iter_envelopes(freqs, duration, gain, fade, waveform, frame_rate,
+                                                                 stats=stats, bank=bank)))
+        # the buffer grows in place, doubling when it is full
+        if len(values) > len(column["envelopes"]):
+            grown = np.empty((max(2 * len(column["envelopes"]), len(values)), envelopes.shape[1]), dtype=np.int16)
+            grown[:n] = column["envelopes"][:n]
+            column["envelopes"] = grown
+        column["envelopes"][n:len(values)] = envelopes
+        cache.synthesized += len(envelopes)
+
+    column["values"] = values.copy()
+    return column["envelopes"][:len(values)]
+
+
+def __column_blocks(lines, t, min_freq, min_value, tic, duration, gain, waveform="sine", stats=None, cache=None,
+        frame_rate=synthesis.FRAME_RATE, channels=2, bank=None):
+    __duration = int(duration/4)
+    if cache is not None:
+        envelopes = __cached_envelopes(lines[:, t], t, min_freq, min_value, tic, duration, gain, __duration,
+                                       waveform, cache, stats, frame_rate, bank)
+
+    for begin in range(0, lines.shape[0], synthesis.BLOCK_SIZE):
+        x = np.arange(begin, min(begin + synthesis.BLOCK_SIZE, lines.shape[0]))
+        pans = -1.0 + x / lines.shape[0] * 2
+        if cache is not None:
+            yield synthesis.pan_notes(envelopes[x[0]:x[-1] + 1], pans, stats, channels)
+            continue
+
+        freqs = min_freq + (lines[x[0]:x[-1] + 1, t].astype(np.float64) - min_value) * tic
+        yield from synthesis.iter_notes(freqs, pans, duration, gain, __duration, waveform, frame_rate,
+                                        synthesis.BLOCK_SIZE, stats, channels, bank)
+
+
+def __overlay_plot(lines, labels, min_freq, min_value, tic, duration, gains, speech, timbres, headroom, stats,
+        cache=None, frame_rate=synthesis.FRAME_RATE, channels=2, bank=None):
     for t in range(lines.shape[1]):
-        __tones_t = AudioSegment.silent(duration=0)
-        __duration = int(duration/4)
+        yield __tts(__timbre_phrase(labels[t], timbres[t]), speech, stats)
 
-        for x, y in enumerate(lines[:, t]):
-            gen = [Sine, Pulse, Square, Sawtooth, Triangle][t](min_freq + (y - min_value) * tic)
-            wav = gen.to_audio_segment(duration=duration).apply_gain(gains[t])
-            wav = wav.fade_in(__duration).fade_out(__duration).pan(-1.0 + x / lines.shape[0]*2)
-            __tones_t += wav
+    columns = [__column_blocks(lines, t, min_freq, min_value, tic, duration, gains[t], timbres[t], stats, cache,
+                               frame_rate, channels, bank)
+               for t in range(lines.shape[1])]
+    factor = 1.0 if headroom is None else synthesis.headroom_factor(gains, headroom, channels)
 
-        if __tones is None:
-            __tones = __tones_t
-        else:
-            __tones = __tones.overlay(__tones_t)
+    # the overlay is aligned to whole milliseconds as AudioSegment.overlay does
+    remaining = synthesis.overlay_frames(lines.shape[0] * synthesis.note_frames(duration, int(duration/4), frame_rate),
+                                         frame_rate)
+    for blocks in zip(*columns):
+        with measure(stats, "mix") as stage:
+            mixed = synthesis.mix(blocks, factor)[:remaining]
+            stage.bytes = mixed.nbytes
+        remaining -= len(mixed)
+        yield mixed
 
-    return tones + __tones
+    if remaining > 0:
+        yield np.zeros((remaining, channels), dtype=np.int16)
 
 
-def __sequential_plot(tones, lines, labels, min_freq, min_value, tic, duration, gains):
+def __sequential_plot(lines, labels, min_freq, min_value, tic, duration, gains, speech, stats, cache=None,
+        frame_rate=synthesis.FRAME_RATE, channels=2, bank=None):
     for t in range(lines.shape[1]):
-        tones += __tts(labels[t])
-        __duration = int(duration/4)
+        yield __tts(labels[t], speech, stats)
+        yield from __column_blocks(lines, t, min_freq, min_value, tic, duration, gains[t], stats=stats, cache=cache,
+                                   frame_rate=frame_rate, channels=channels, bank=bank)
+
+
+def __convert(segments, stats, frame_rate=synthesis.FRAME_RATE, channels=2):
+    speech = segments[0]
+    for segment in segments[1:]:
+        speech = speech + segment
+
+    with measure(stats, "speech_convert") as stage:
+        # the speech is resampled once to the quality of the notes
+        speech = speech.set_channels(channels).set_frame_rate(frame_rate).set_sample_width(synthesis.SAMPLE_WIDTH)
+        stage.bytes = len(speech.raw_data)
+    return np.frombuffer(speech.raw_data, dtype=np.int16).reshape((-1, channels))
+
+
+def __frames(parts, stats, cache=None, frame_rate=synthesis.FRAME_RATE, channels=2):
+    # consecutive speech is joined and converted like AudioSegment.__add__ would do with the tones
+    segments = []
+    used = set()
+    for part in parts:
+        if isinstance(part, AudioSegment):
+            segments.append(part)
+            continue
+
+        if segments:
+            if cache is None:
+                yield __convert(segments, stats, frame_rate, channels)
+            else:
+                # the segments are kept with the frames, so that their ids stay unique
+                key = (frame_rate, channels) + tuple(id(segment) for segment in segments)
+                if key not in cache.frames:
+                    cache.frames[key] = (segments, __convert(segments, stats, frame_rate, channels))
+                used.add(key)
+                yield cache.frames[key][1]
+            segments = []
+        yield part
+
+    if cache is not None:
+        # speech of the earlier descriptions is not needed any more
+        for key in set(cache.frames) - used:
+            del cache.frames[key]
+
+
+def __render(lines, labels, ptype, duration, gain, gains, min_freq, max_freq, decimals, description,
+        timbres=None, headroom=None, max_points=None, target_duration=None, downsample="minmax", stats=None,
+        cache=None, frame_rate=synthesis.FRAME_RATE, channels=2, bank=None):
+    assert max_freq < frame_rate / 2, "max_freq must be lower than half of frame_rate"
+
+    # arrays, memmaps, pandas objects and buffers are read in place and keep their dtype
+    lines = np.asarray(lines)
+
+    assert lines.ndim in [1, 2], "numpy array lines.ndim must be 1 or 2"
+    if lines.ndim == 2:
+        assert lines.shape[0] > lines.shape[1], "lines.shape must be time and lines each"
+    else:
+        lines = lines.reshape((-1, 1))
+
+    if labels is None:
+        labels = ["line {}".format(l+1) for l in range(lines.shape[1])]
+    else:
+        assert len(labels) == lines.shape[1], "len(labels) must equal lines.shape[1]"
+
+    if gains is None:
+        gains = [gain for _ in range(lines.shape[1])]
+    else:
+        assert len(gains) == lines.shape[1], "len(gains) must equal lines.shape[1]"
+
+    if ptype not in ["sequential", "overlay"]:
+        raise NotImplementedError("ptype must be sequential or overlay")
 
-        for x, y in enumerate(lines[:, t]):
-            gen = Sine(min_freq + (y - min_value) * tic)
-            sine = gen.to_audio_segment(duration=duration).apply_gain(gains[t])
-            sine = sine.fade_in(__duration).fade_out(__duration).pan(-1.0 + x / lines.shape[0] * 2)
-            tones += sine
+    if timbres is None:
+        timbres = synthesis.WAVEFORMS
+    assert all(timbre in synthesis.WAVEFORMS for timbre in timbres), "timbres must be in {}".format(synthesis.WAVEFORMS)
+    timbres = [timbres[t % len(timbres)] for t in range(lines.shape[1])]
 
-    return tones
+    min_value = np.nanmin(lines)
+    max_value = np.nanmax(lines)
+    # the pitch is mapped in float64, because integers would wrap around in their own dtype
+    tic = (max_freq - min_freq) / (np.float64(max_value) - np.float64(min_value))
+
+    # the description above is based on the full resolution data
+    if target_duration is not None:
+        max_points = min(max_points or np.inf, max(2, target_duration // duration))
+    if max_points is not None:
+        with measure(stats, "downsample") as stage:
+            lines = downsampling.reduce(lines, int(max_points), downsample)
+            stage.bytes = lines.nbytes
+
+    # synthesize all phrases concurrently while the tones are rendered
+    phrases = __phrases(labels, ptype, timbres, min_value, max_value, decimals, description)
+    if cache is None:
+        speech = tts.prefetch(phrases)
+    else:
+        speech = cache.speech
+        # phrases of the earlier minimum and maximum are not needed any more
+        for phrase in set(speech) - set(phrases):
+            del speech[phrase]
+        speech.update(tts.prefetch([phrase for phrase in phrases if phrase not in speech]))
+
+    def parts():
+        yield __SILENCE
+
+        if description:
+            # describe yaxis
+            yield __tts("minimum value is {}".format(np.round(min_value, decimals)), speech, stats)
+            yield __sample(min_freq, cache, frame_rate)
+            yield __tts("maximum value is {}".format(np.round(max_value, decimals)), speech, stats)
+            yield __sample(max_freq, cache, frame_rate)
+
+        # plot lines
+        if ptype == "sequential":
+            yield from __sequential_plot(lines, labels, min_freq, min_value, tic, duration, gains, speech, stats,
+                                         cache, frame_rate, channels, bank)
+        else:
+            yield from __overlay_plot(lines, labels, min_freq, min_value, tic, duration, gains, speech,
+                                      timbres, headroom, stats, cache, frame_rate, channels, bank)
+
+    return __frames(parts(), stats, cache, frame_rate, channels)
 
 
 def plot(lines: np.array, labels: list=None, ptype: str="sequential", duration: int=50, gain: int=-5, gains: list=None,
-        min_freq: float=130.813, max_freq: float=130.813*4, decimals: int=1, description: bool=True, autoplay: bool=True) -> AudioSegment:
+        min_freq: float=130.813, max_freq: float=130.813*4, decimals: int=1, description: bool=True, autoplay: bool=True,
+        timbres: list=None, headroom: float=None, max_points: int=None, target_duration: int=None,
+        downsample: str="minmax", stats: RenderStats=None, cache: RenderCache=None, quality: str="full",
+        frame_rate: int=None, channels: int=None, sample_width: int=None, bank: NoteBank=None) -> AudioSegment:
     """Plots that represent data with sound and can be checked by only audio
 
     Play back the data given in the array as sound in order.
@@ -98,6 +329,39 @@ def plot(lines: np.array, labels: list=None, ptype: str="sequential", duration:
     autoplay: bool
         Whether to play immediately after execution.
         Default is true
+    timbres: list
+        Waveforms assigned to the lines in "overlay", cycled when there are more lines.
+        Default is ["sine", "pulse", "square", "sawtooth", "triangle"]
+    headroom: float
+        If set, the overlaid lines are scaled once so that the mix peaks at -headroom dBFS
+        instead of being clipped. Optional.
+    max_points: int
+        Maximum number of notes of each line. Longer data is reduced before synthesis. Optional.
+    target_duration: int
+        Maximum length of the notes of each line in msec, which limits max_points. Optional.
+    downsample: str
+        How to reduce the data, "minmax" keeps the minimum and maximum of each bucket,
+        "mean" averages each bucket and "lttb" uses Largest-Triangle-Three-Buckets.
+        Default is minmax
+    stats: RenderStats
+        Filled with the wall time and output bytes of each stage, their allocated bytes with trace_memory,
+        and the number of notes and samples. Optional.
+    cache: RenderCache
+        Speech and notes reused from the previous render of the same series, which may have grown since.
+        Not used with max_points or target_duration. See PlotSession. Optional.
+    quality: str
+        "full" renders 44.1 kHz 16-bit stereo, and "preview" 16 kHz 16-bit mono without pan,
+        which is several times cheaper to render and to play in a notebook.
+        Default is full
+    frame_rate: int
+        Sampling rate of the notes, the speech and the output, which overrides the quality. Optional.
+    channels: int
+        2 for stereo with pan, or 1 for mono, which overrides the quality. Optional.
+    sample_width: int
+        Bytes per sample of the output, 1 or 2, which overrides the quality.
+        Notes are synthesized in 16 bits either way. Optional.
+    bank: NoteBank
+        Notes reused for repeated values within and across renders, optionally snapped to a scale. Optional.
 
     Examples
     --------
@@ -109,49 +373,269 @@ def plot(lines: np.array, labels: list=None, ptype: str="sequential", duration:
     <IPython.lib.display.Audio object>
     """
 
-    if type(lines) == list:
-        lines = np.array(copy.copy(lines))
+    frame_rate, channels, sample_width = __quality(quality, frame_rate, channels, sample_width)
+    frames = [np.ascontiguousarray(frames) for frames in __render(lines, labels, ptype, duration, gain, gains,
+              min_freq, max_freq, decimals, description, timbres, headroom, max_points, target_duration,
+              downsample, stats, cache, frame_rate, channels, bank)]
 
-    assert lines.ndim in [1, 2], "numpy array lines.ndim must be 1 or 2"
-    if lines.ndim == 2:
-        assert lines.shape[0] > lines.shape[1], "lines.shape must be time and lines each"
-    else:
-        lines = copy.copy(lines).reshape((-1, 1))
+    if autoplay:
+        # IPython is needed only to play in a notebook
+        from IPython.display import Audio, display
 
-    if labels is None:
-        labels = ["line {}".format(l+1) for l in range(lines.shape[1])]
-    else:
-        assert len(labels) == lines.shape[1], "len(labels) must equal lines.shape[1]"
+        with measure(stats, "output") as stage:
+            # a WAV file is played as it is, without normalization or another copy in IPython
+            data = encoding.to_wav(frames, frame_rate, sample_width)
+            stage.bytes = len(data)
+
+        with measure(stats, "display"):
+            display(Audio(data=data, autoplay=True))
 
-    if gains is None:
-        gains = [gain for _ in range(lines.shape[1])]
     else:
-        assert len(gains) == lines.shape[1], "len(gains) must equal lines.shape[1]"
+        with measure(stats, "output") as stage:
+            if sample_width == 1:
+                # the high byte of each sample, as AudioSegment.set_sample_width(1) keeps
+                frames = [(chunk >> 8).astype(np.int8) for chunk in frames]
+            # the frames are copied once into the data of the AudioSegment
+            tones = AudioSegment(data=b"".join(frames), sample_width=sample_width, frame_rate=frame_rate,
+                                 channels=channels)
+            stage.bytes = len(tones.raw_data)
+        return tones
 
-    min_value = np.nanmin(lines)
-    max_value = np.nanmax(lines)
-    tic = (max_freq - min_freq) / (max_value - min_value)
 
-    tones = AudioSegment.silent(duration=0)
+class PlotSession:
+    """Audio plot of a growing series, which synthesizes only the new notes on append
 
-    if description:
-        # describe yaxis
-        tones += __tts("minimum value is {}".format(np.round(min_value, decimals)))
-        tones += __sample(min_freq)
-        tones += __tts("maximum value is {}".format(np.round(max_value, decimals)))
-        tones += __sample(max_freq)
-
-    # plot lines
-    if ptype == "sequential":
-        tones = __sequential_plot(tones, lines, labels, min_freq, min_value, tic, duration, gains)
-    elif ptype == "overlay":
-        tones = __overlay_plot(tones, lines, labels, min_freq, min_value, tic, duration, gains)
-    else:
-        raise NotImplementedError("ptype must be sequential or overlay")
+    The speech and the notes of each line are kept between renders. The earlier notes are
+    synthesized again only when the new rows change the minimum or maximum, and so the pitch
+    of every note. Otherwise only the pan of the earlier notes is applied again, because
+    it depends on the length of the series.
 
-    if autoplay:
-        display(Audio(tones.get_array_of_samples(), rate=tones.frame_rate*2, autoplay=True))
+    Parameters
+    ----------
+    lines : np.array
+        The rows of the series so far. See plot.
 
-    else:
-        return tones
+    Other keyword arguments are those of plot, except autoplay, max_points, target_duration and cache.
+
+    Examples
+    --------
+    >>> session = PlotSession(history, labels=["latency"], description=False)
+    >>> tones = session.append(new_rows)
+    >>> session.cache.synthesized
+    1002
+    """
+
+    def __init__(self, lines: np.array, **kwargs):
+        assert not {"autoplay", "max_points", "target_duration", "cache"} & set(kwargs), \
+            "autoplay, max_points, target_duration and cache can not be set for a session"
+
+        lines = np.array(lines)
+        self.__values = lines.reshape((len(lines), -1))
+        self.__length = len(lines)
+        self.kwargs = kwargs
+        self.cache = RenderCache()
+        self.tones = None
+
+    @property
+    def lines(self) -> np.array:
+        return self.__values[:self.__length]
+
+    def append(self, rows: np.array) -> AudioSegment:
+        """Append rows to the series and render it
+
+        Returns
+        -------
+        AudioSegment
+            The same audio as plot of all the rows.
+        """
+        rows = np.asarray(rows).reshape((-1, self.__values.shape[1]))
+
+        # the rows are kept in a buffer which grows in place, doubling when it is full,
+        # and is copied when the new rows need a wider dtype, e.g. floats after ints
+        dtype = np.result_type(self.__values, rows)
+        if self.__length + len(rows) > len(self.__values):
+            grown = np.empty((max(2 * len(self.__values), self.__length + len(rows)), self.__values.shape[1]),
+                             dtype=dtype)
+            grown[:self.__length] = self.lines
+            self.__values = grown
+        elif dtype != self.__values.dtype:
+            self.__values = self.__values.astype(dtype)
+        self.__values[self.__length:self.__length + len(rows)] = rows
+        self.__length += len(rows)
+
+        return self.render()
+
+    def render(self) -> AudioSegment:
+        self.tones = plot(self.lines, autoplay=False, cache=self.cache, **self.kwargs)
+        return self.tones
+
+    def play(self):
+        """Render the series and play it in a notebook"""
+        plot(self.lines, autoplay=True, cache=self.cache, **self.kwargs)
+
+
+def render_stream(lines: np.array, labels: list=None, ptype: str="sequential", duration: int=50, gain: int=-5,
+        gains: list=None, min_freq: float=130.813, max_freq: float=130.813*4, decimals: int=1,
+        description: bool=True, timbres: list=None, headroom: float=None, max_points: int=None,
+        target_duration: int=None, downsample: str="minmax", stats: RenderStats=None,
+        chunk_size: int=synthesis.FRAME_RATE, quality: str="full", frame_rate: int=None, channels: int=None,
+        bank: NoteBank=None):
+    """Render the same audio as plot chunk by chunk
+
+    Notes are synthesized block by block while the chunks are consumed,
+    so the memory usage does not depend on the length of lines.
+
+    Parameters
+    ----------
+    lines : np.array
+        A numpy array of values to be graphed. See plot.
+    chunk_size: int
+        Number of frames in each chunk. The last chunk may be shorter.
+        Default is 44100 (one second at full quality).
+
+    Other parameters are the same as plot.
+
+    Yields
+    ------
+    np.array
+        Interleaved 16-bit samples of shape (chunk_size, channels) at the frame rate of the quality.
+
+    Examples
+    --------
+    >>> write_wav("graph.wav", render_stream(np.sin(np.arange(0, 1000, 0.1))))
+    """
+    frame_rate, channels, _ = __quality(quality, frame_rate, channels, None)
+    chunk = np.empty((chunk_size, channels), dtype=np.int16)
+    filled = 0
+    for frames in __render(lines, labels, ptype, duration, gain, gains, min_freq, max_freq, decimals, description,
+                           timbres, headroom, max_points, target_duration, downsample, stats, None, frame_rate,
+                           channels, bank):
+        while len(frames) > 0:
+            n = min(chunk_size - filled, len(frames))
+            chunk[filled:filled + n] = frames[:n]
+            frames = frames[n:]
+            filled += n
+
+            if filled == chunk_size:
+                yield chunk.copy()
+                filled = 0
+
+    if filled > 0:
+        yield chunk[:filled].copy()
+
+
+def write_wav(path: str, chunks, frame_rate: int=synthesis.FRAME_RATE, channels: int=2):
+    """Write chunks of 16-bit samples to a WAV file as they arrive
+
+    Parameters
+    ----------
+    path : str
+        Path of the WAV file.
+    chunks : iterable
+        Arrays of interleaved 16-bit samples, e.g. from render_stream.
+    frame_rate: int
+        Sampling rate of the samples.
+    channels: int
+        Number of channels of the samples.
+    """
+    encoding.write(path, chunks, frame_rate, channels, "wav")
+
+
+def save(path: str, lines: np.array, format: str=None, quality: str="full", frame_rate: int=None,
+        channels: int=None, sample_width: int=None, **kwargs) -> str:
+    """Render the same audio as plot straight into an audio file
+
+    The audio is streamed into the file, so long renders need little memory,
+    and no external encoder like ffmpeg is started. A WAV file can be mapped
+    into memory afterwards with encoding.memmap.
+
+    Parameters
+    ----------
+    path : str
+        Path of the audio file.
+    lines : np.array
+        A numpy array of values to be graphed. See plot.
+    format: str
+        "wav", or "flac", "ogg" or "mp3" with the soundfile package installed.
+        Default is the extension of the path, or wav.
+    quality: str
+        "full" or "preview". frame_rate, channels and sample_width override it. See plot.
+
+    Other keyword arguments are those of render_stream.
+
+    Returns
+    -------
+    str
+        path
+
+    Examples
+    --------
+    >>> save("graph.flac", np.sin(np.arange(0, 1000, 0.1)), duration=20)
+    'graph.flac'
+    """
+    frame_rate, channels, sample_width = __quality(quality, frame_rate, channels, sample_width)
+    encoding.write(path, render_stream(lines, frame_rate=frame_rate, channels=channels, **kwargs), frame_rate,
+                   channels, format, sample_width)
+    return path
+
+
+def __init_worker(engine, cache_dir, cache_size, scratch_dir):
+    tts.set_engine(engine)
+    tts.set_cache(cache_dir, cache_size)
+
+    # decoders of pydub write temporary files, which are kept apart for each worker
+    tempfile.tempdir = tempfile.mkdtemp(prefix="worker_{}_".format(os.getpid()), dir=scratch_dir)
+
+
+def __render_item(index, item, out_dir):
+    item = dict(item)
+    name = str(item.pop("name", "plot_{}".format(index)))
+    path = os.path.join(out_dir, name + ".wav")
+
+    start = time.perf_counter()
+    try:
+        save(path, format="wav", **item)
+        error = None
+    except Exception:
+        error = traceback.format_exc()
+        if os.path.exists(path):
+            os.remove(path)
+
+    return {"name": name, "path": None if error else path, "seconds": time.perf_counter() - start, "error": error}
+
+
+def render_batch(items: list, out_dir: str, workers: int=None) -> list:
+    """Render many plots to WAV files in parallel processes
+
+    Each item is rendered in a process pool with save and written to out_dir.
+    The workers share the speech engine and the disk cache of tts, and have their own scratch directories.
+    A failure of an item does not stop the others.
+
+    Parameters
+    ----------
+    items : list
+        A list of dicts with the arguments of save, e.g. {"lines": data, "labels": ["A"], "quality": "preview"}.
+        An optional "name" is used as the file name, otherwise "plot_<index>".
+    out_dir : str
+        Directory in which the WAV files are written.
+    workers: int
+        Number of processes. Default is the number of CPUs.
+
+    Returns
+    -------
+    list
+        For each item in order, a dict with "name", "path" (None on failure),
+        "seconds" of rendering and "error" (the traceback on failure, otherwise None).
+
+    Examples
+    --------
+    >>> render_batch([{"lines": np.sin(np.arange(0, 10, 0.1)), "name": "sin"}], out_dir="sounds", workers=4)
+    [{'name': 'sin', 'path': 'sounds/sin.wav', 'seconds': 0.2, 'error': None}]
+    """
+    os.makedirs(out_dir, exist_ok=True)
 
+    with tempfile.TemporaryDirectory(prefix="audio_plot_lib_") as scratch_dir, \
+            ProcessPoolExecutor(max_workers=workers, initializer=__init_worker,
+                                initargs=(tts.engine, tts.cache_dir, tts.cache_size, scratch_dir)) as executor:
+        futures = [executor.submit(__render_item, index, item, out_dir) for index, item in enumerate(items)]
+        return [future.result() for future in futures]
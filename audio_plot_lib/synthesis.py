@@ -0,0 +1,388 @@
+import math
+import threading
+from collections import OrderedDict
+import numpy as np
+from pydub import AudioSegment
+from .stats import measure
+
+FRAME_RATE = 44100
+SAMPLE_WIDTH = 2
+WAVEFORMS = ["sine", "pulse", "square", "sawtooth", "triangle"]
+BLOCK_SIZE = 256
+# frame rate, channels and sample width of each render quality
+QUALITIES = {"full": (FRAME_RATE, 2, SAMPLE_WIDTH), "preview": (16000, 1, SAMPLE_WIDTH)}
+
+__MIN_VALUE = -32768
+__MAX_VALUE = 32767
+__MAX_BOOST_DB = 20 * math.log(2.0, 10)
+
+
+def db_to_float(db):
+    return 10 ** (np.asarray(db, dtype=float) / 20)
+
+
+def __mul(samples, factor):
+    # same rounding and clipping as audioop.mul
+    return np.floor(np.clip(samples * factor, __MIN_VALUE, __MAX_VALUE))
+
+
+def __wave(waveform, freqs, n_frames, frame_rate):
+    n = np.arange(n_frames, dtype=float)
+    freqs = freqs[:, None]
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        if waveform == "sine":
+            return np.sin((freqs * 2 * np.pi) / frame_rate * n)
+
+        cycle_length = frame_rate / freqs
+        position = n % cycle_length
+        if waveform in ["pulse", "square"]:
+            return np.where(position < cycle_length * 0.5, 1.0, -1.0)
+
+        duty_cycle = 1.0 if waveform == "sawtooth" else 0.5
+        midpoint = cycle_length * duty_cycle
+        return np.where(position < midpoint, (2 * position / midpoint) - 1.0,
+                        1.0 - (2 * (position - midpoint) / (cycle_length - midpoint)))
+
+
+def __fade_plan(n_frames, frame_rate, from_gain, to_gain, start, end):
+    """Frame indices and factors equivalent to pydub's AudioSegment.fade"""
+    length = round(1000 * (n_frames / frame_rate))
+
+    def position(ms):
+        return int(min(ms, length) * (frame_rate / 1000.0))
+
+    from_power = float(db_to_float(from_gain))
+    to_power = float(db_to_float(to_gain))
+    duration = end - start
+
+    before = np.arange(position(0), position(start))
+    indices = [before]
+    factors = [np.full(len(before), from_power if from_gain != 0 else 1.0)]
+
+    gain_delta = to_power - from_power
+    if duration > 100:
+        scale_step = gain_delta / duration
+        for i in range(duration):
+            chunk = np.arange(position(start + i), position(start + i + 1))
+            indices.append(chunk)
+            factors.append(np.full(len(chunk), from_power + scale_step * i))
+    else:
+        start_frame = start * (frame_rate / 1000.0)
+        fade_frames = end * (frame_rate / 1000.0) - start_frame
+        scale_step = gain_delta / fade_frames
+        i = np.arange(int(fade_frames))
+        chunk = (start_frame + i).astype(int)
+        indices.append(chunk[chunk < n_frames])
+        factors.append((from_power + scale_step * i)[chunk < n_frames])
+
+    after = np.arange(position(end), position(length))
+    indices.append(after)
+    factors.append(np.full(len(after), to_power if to_gain != 0 else 1.0))
+
+    # indices past the end are padded with silence as pydub does
+    return np.minimum(np.concatenate(indices), n_frames), np.concatenate(factors)
+
+
+def __fade(samples, plan):
+    indices, factors = plan
+    padded = np.concatenate([samples, np.zeros((samples.shape[0], 1))], axis=1)
+    return __mul(padded[:, indices], factors)
+
+
+def pan_factors(pans):
+    """Left and right channel factors of pydub's AudioSegment.pan
+
+    Parameters
+    ----------
+    pans : np.array
+        Pan amounts between -1.0 (left) and 1.0 (right).
+
+    Returns
+    -------
+    tuple of np.array
+        Multipliers applied to the left and right channel.
+    """
+    pans = np.asarray(pans, dtype=float)
+    boost_db = np.abs(pans) * __MAX_BOOST_DB
+    reduce_factor = 10 ** (__MAX_BOOST_DB / 20) - 10 ** (boost_db / 20)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        reduce_db = np.where(reduce_factor > 0, 20 * (np.log(reduce_factor) / np.log(10)), -np.inf)
+    boost_db = boost_db / 2.0
+
+    left = np.where(pans < 0, boost_db, reduce_db)
+    right = np.where(pans < 0, reduce_db, boost_db)
+    return db_to_float(left), db_to_float(right)
+
+
+def note_frames(duration: int, fade: int=0, frame_rate: int=FRAME_RATE) -> int:
+    """Number of frames of a single rendered note"""
+    n_frames = int(frame_rate * (duration / 1000.0))
+    for plan in __fade_plans(n_frames, duration, fade, frame_rate):
+        n_frames = len(plan[0])
+    return n_frames
+
+
+def __fade_plans(n_frames, duration, fade, frame_rate):
+    if fade <= 0:
+        return []
+
+    fade_in = __fade_plan(n_frames, frame_rate, -120, 0, 0, fade)
+    length = round(1000 * (len(fade_in[0]) / frame_rate))
+    fade_out = __fade_plan(len(fade_in[0]), frame_rate, 0, -120, length - fade, length)
+    return [fade_in, fade_out]
+
+
+class NoteBank:
+    """Rendered notes kept by their waveform, frequency, duration, gain, fade and frame rate
+
+    A series of repeated values, e.g. counts or status codes, is synthesized once for each
+    distinct value, and only the pan is applied to each note. The least recently used notes
+    are evicted when the bank is full.
+
+    Parameters
+    ----------
+    size: int
+        Maximum number of notes kept.
+    semitones: float
+        If set, the frequencies are snapped to steps of this many semitones from A4 (440 Hz),
+        e.g. 1 for the notes of the chromatic scale, so that close values share a note. Optional.
+
+    Examples
+    --------
+    >>> bank = NoteBank(semitones=1)
+    >>> tones = playable.plot(status_codes, bank=bank, autoplay=False)
+    >>> bank.hits, bank.misses
+    (9988, 12)
+    """
+
+    def __init__(self, size: int=1024, semitones: float=None):
+        self.size = size
+        self.semitones = semitones
+        self.notes = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.__lock = threading.Lock()
+
+    def quantize(self, freqs: np.array) -> np.array:
+        """Frequencies snapped to the steps of semitones, or as they are. NaN stays NaN."""
+        if self.semitones is None:
+            return freqs
+        steps = np.round(12 * np.log2(freqs / 440.0) / self.semitones) * self.semitones
+        return 440.0 * 2 ** (steps / 12)
+
+    def envelopes(self, freqs: np.array, key: tuple, render) -> np.array:
+        """Notes of the frequencies, calling render(freqs) only for the distinct ones not in the bank"""
+        unique, inverse = np.unique(freqs, return_inverse=True)
+        # NaN is not equal to itself, so the silent note is kept as None
+        keys = [key + (float(freq) if freq == freq else None,) for freq in unique]
+
+        with self.__lock:
+            rows = [self.notes.get(k) for k in keys]
+            for k, row in zip(keys, rows):
+                if row is not None:
+                    self.notes.move_to_end(k)
+
+        missing = [i for i, row in enumerate(rows) if row is None]
+        if missing:
+            for i, row in zip(missing, render(unique[missing])):
+                rows[i] = row.copy()
+
+        with self.__lock:
+            for i in missing:
+                self.notes[keys[i]] = rows[i]
+            while len(self.notes) > self.size:
+                self.notes.popitem(last=False)
+            self.misses += len(missing)
+            self.hits += len(freqs) - len(missing)
+
+        return np.stack(rows)[inverse]
+
+    def clear(self):
+        with self.__lock:
+            self.notes.clear()
+
+
+def __oscillate(freqs, waveform, n_frames, frame_rate):
+    silent = np.isnan(freqs)
+    samples = np.trunc(__wave(waveform, np.where(silent, 1.0, freqs), n_frames, frame_rate) * __MAX_VALUE * 1.0)
+    samples[silent] = 0
+    return samples
+
+
+def __shape(samples, gain_factor, plans):
+    samples = __mul(samples, gain_factor)
+    for plan in plans:
+        samples = __fade(samples, plan)
+    # the samples are whole numbers in the range of 16 bits
+    return samples.astype(np.int16)
+
+
+def __envelope_block(freqs, waveform, n_frames, frame_rate, gain_factor, plans, stats):
+    # each stage is a call of its own function, so that profilers show them apart
+    with measure(stats, "waveform") as stage:
+        samples = __oscillate(freqs, waveform, n_frames, frame_rate)
+        stage.bytes = samples.nbytes
+
+    with measure(stats, "envelope") as stage:
+        samples = __shape(samples, gain_factor, plans)
+        stage.bytes = samples.nbytes
+
+    return samples
+
+
+def iter_envelopes(freqs: np.array, duration: int, gain: float=0, fade: int=0, waveform: str="sine",
+        frame_rate: int=FRAME_RATE, block_size: int=BLOCK_SIZE, stats=None, bank: NoteBank=None):
+    """Render a series of mono notes with the gain and fades applied, block by block
+
+    These are the notes of iter_notes before panning, so they can be kept
+    and panned again when only the pan of the notes changes.
+    With a bank, notes already in it are not synthesized again.
+
+    Yields
+    ------
+    np.array
+        16-bit samples of shape (notes, frames).
+    """
+    assert waveform in WAVEFORMS, "waveform must be one of {}".format(WAVEFORMS)
+
+    freqs = np.asarray(freqs, dtype=float).reshape(-1)
+    n_frames = int(frame_rate * (duration / 1000.0))
+    plans = __fade_plans(n_frames, duration, fade, frame_rate)
+    gain_factor = float(db_to_float(gain))
+
+    def render(__freqs):
+        return __envelope_block(__freqs, waveform, n_frames, frame_rate, gain_factor, plans, stats)
+
+    if bank is not None:
+        freqs = bank.quantize(freqs)
+    for begin in range(0, len(freqs), block_size):
+        __freqs = freqs[begin:begin + block_size]
+        if bank is None:
+            yield render(__freqs)
+        else:
+            yield bank.envelopes(__freqs, (waveform, duration, gain, fade, frame_rate), render)
+
+
+def pan_notes(samples: np.array, pans: np.array, stats=None, channels: int=2) -> np.array:
+    """Pan mono notes of shape (notes, frames) into interleaved 16-bit stereo samples of shape (frames, 2)
+
+    With channels=1 the notes are not panned, and are returned as mono samples of shape (frames, 1).
+    """
+    if channels == 1:
+        if stats is not None:
+            stats.count(notes=len(samples), samples=samples.size)
+        return samples.reshape(-1, 1)
+
+    with measure(stats, "pan") as stage:
+        left, right = pan_factors(pans)
+        block = np.empty(samples.shape + (2,), dtype=np.int16)
+        block[:, :, 0] = __mul(samples, left[:, None])
+        block[:, :, 1] = __mul(samples, right[:, None])
+        stage.bytes = block.nbytes
+
+    if stats is not None:
+        stats.count(notes=len(samples), samples=block.size)
+    return block.reshape(-1, 2)
+
+
+def iter_notes(freqs: np.array, pans: np.array, duration: int, gain: float=0, fade: int=0,
+        waveform: str="sine", frame_rate: int=FRAME_RATE, block_size: int=BLOCK_SIZE, stats=None,
+        channels: int=2, bank: NoteBank=None):
+    """Render a series of notes block by block
+
+    Each note is equivalent to
+    ``Generator(freq).to_audio_segment(duration).apply_gain(gain).fade_in(fade).fade_out(fade).pan(pan)``
+    of pydub, but all notes of a block are computed in a single NumPy pass.
+
+    Parameters
+    ----------
+    freqs : np.array
+        Frequency of each note. NaN frequencies are rendered as silence.
+    pans : np.array
+        Pan amount of each note between -1.0 (left) and 1.0 (right).
+    duration: int
+        Length of each note in msec.
+    gain: float
+        Volume of the notes in dB.
+    fade: int
+        Length of fade in and fade out in msec.
+    waveform: str
+        One of WAVEFORMS.
+    frame_rate: int
+        Sampling rate of the rendered notes.
+    block_size: int
+        Number of notes rendered at once.
+    stats: RenderStats
+        Filled with the time of the waveform, envelope and pan stages. Optional.
+    channels: int
+        2 for panned stereo notes, or 1 for mono notes without pan.
+    bank: NoteBank
+        Notes reused across blocks and renders. Optional.
+
+    Yields
+    ------
+    np.array
+        Interleaved 16-bit samples of shape (frames, channels).
+    """
+    freqs = np.asarray(freqs, dtype=float).reshape(-1)
+    pans = np.broadcast_to(np.asarray(pans, dtype=float), freqs.shape)
+
+    begin = 0
+    for samples in iter_envelopes(freqs, duration, gain, fade, waveform, frame_rate, block_size, stats, bank):
+        yield pan_notes(samples, pans[begin:begin + len(samples)], stats, channels)
+        begin += len(samples)
+
+
+def render_notes(freqs: np.array, pans: np.array, duration: int, gain: float=0, fade: int=0,
+        waveform: str="sine", frame_rate: int=FRAME_RATE) -> np.array:
+    """Render a series of notes into one buffer
+
+    See iter_notes for the parameters. Render time grows linearly with the number of notes.
+
+    Returns
+    -------
+    np.array
+        Interleaved 16-bit stereo samples of shape (frames, 2).
+    """
+    n_notes = np.asarray(freqs).size
+    samples = np.empty((n_notes * note_frames(duration, fade, frame_rate), 2), dtype=np.int16)
+    position = 0
+    for block in iter_notes(freqs, pans, duration, gain, fade, waveform, frame_rate):
+        samples[position:position + len(block)] = block
+        position += len(block)
+    return samples
+
+
+def mix(tracks: list, factor: float=1.0) -> np.array:
+    """Sum any number of tracks of the same shape in one pass
+
+    The sum is scaled by factor once and saturated to 16 bits.
+    """
+    mixed = np.zeros(tracks[0].shape, dtype=np.int32)
+    for track in tracks:
+        mixed += track
+    return __mul(mixed, factor).astype(np.int16)
+
+
+def headroom_factor(gains: list, headroom: float=0, channels: int=2) -> float:
+    """Scale of a mix of lines with the gains which keeps its peak at -headroom dBFS
+
+    The peak is estimated from the full scale waveform, the gain and the largest pan boost of each line,
+    so it is known before rendering and the same factor can be applied to every block of a stream.
+    Mono notes are not panned, so they have no pan boost.
+    """
+    boost = float(np.max(pan_factors([-1.0]))) if channels == 2 else 1.0
+    peak = np.sum(db_to_float(gains)) * boost
+    return min(1.0, float(db_to_float(-headroom)) / peak)
+
+
+def overlay_frames(n_frames: int, frame_rate: int=FRAME_RATE) -> int:
+    """Length of an overlay of n_frames, which AudioSegment.overlay aligns to whole milliseconds"""
+    return int(round(1000 * (n_frames / frame_rate)) * (frame_rate / 1000.0))
+
+
+def to_audio_segment(samples: np.array, frame_rate: int=FRAME_RATE) -> AudioSegment:
+    """Wrap interleaved 16-bit samples of shape (frames, channels) as AudioSegment"""
+    return AudioSegment(data=np.ascontiguousarray(samples, dtype=np.int16).tobytes(),
+                        sample_width=SAMPLE_WIDTH, frame_rate=frame_rate, channels=samples.shape[1])
@@ -0,0 +1,245 @@
+import hashlib
+import io
+import os
+import tempfile
+import threading
+import wave
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from pydub import AudioSegment
+
+
+class GTTSEngine:
+    """Google Text-to-Speech over the network (default)"""
+    name = "gtts"
+    format = "mp3"
+
+    def synthesize(self, text: str, lang: str) -> bytes:
+        from gtts import gTTS
+
+        fp = io.BytesIO()
+        gTTS(text, lang=lang).write_to_fp(fp)
+        return fp.getvalue()
+
+
+class Pyttsx3Engine:
+    """Offline speech with the local pyttsx3 driver (espeak, SAPI5 or NSSpeechSynthesizer)"""
+    name = "pyttsx3"
+    format = "wav"
+
+    # the driver is not thread safe
+    __lock = threading.Lock()
+
+    def __init__(self, rate: int=None):
+        self.rate = rate
+
+    @property
+    def cache_id(self) -> str:
+        return "{}:rate={}".format(self.name, self.rate)
+
+    def synthesize(self, text: str, lang: str) -> bytes:
+        import pyttsx3
+
+        with self.__lock, tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "speech.wav")
+            engine = pyttsx3.init()
+            if self.rate is not None:
+                engine.setProperty("rate", self.rate)
+            engine.save_to_file(text, path)
+            engine.runAndWait()
+            with open(path, "rb") as f:
+                return f.read()
+
+
+class SilentEngine:
+    """Stand-in engine which returns silence in proportion to the length of the text
+
+    Useful for tests and headless rendering without network access.
+    """
+    name = "silent"
+    format = "wav"
+
+    def __init__(self, msec_per_char: int=50, frame_rate: int=24000):
+        self.msec_per_char = msec_per_char
+        self.frame_rate = frame_rate
+
+    @property
+    def cache_id(self) -> str:
+        return "{}:msec_per_char={}:frame_rate={}".format(self.name, self.msec_per_char, self.frame_rate)
+
+    def synthesize(self, text: str, lang: str) -> bytes:
+        fp = io.BytesIO()
+        with wave.open(fp, "wb") as f:
+            f.setnchannels(1)
+            f.setsampwidth(2)
+            f.setframerate(self.frame_rate)
+            f.writeframes(b"\0\0" * int(self.frame_rate * len(text) * self.msec_per_char / 1000))
+        return fp.getvalue()
+
+
+engine = GTTSEngine()
+cache_dir = os.environ.get("AUDIO_PLOT_LIB_CACHE",
+                           os.path.join(os.path.expanduser("~"), ".cache", "audio_plot_lib", "tts"))
+cache_size = 256
+max_workers = 8
+
+__memory = OrderedDict()
+__lock = threading.Lock()
+__executor = None
+
+
+def __reset_after_fork():
+    # threads of the pool do not survive in a forked process
+    global __executor, __lock
+    __executor = None
+    __lock = threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=__reset_after_fork)
+
+
+def set_engine(new_engine):
+    """Set the speech engine
+
+    Parameters
+    ----------
+    new_engine
+        An object with `name` and `format` attributes and a `synthesize(text, lang)` method
+        returning the encoded audio as bytes, e.g. GTTSEngine, Pyttsx3Engine or SilentEngine.
+        An optional `cache_id` attribute, which defaults to `name`, identifies the engine and
+        its settings in the speech cache, so that phrases are synthesized again when they change.
+    """
+    global engine
+    engine = new_engine
+
+
+def set_cache(directory: str=None, size: int=256):
+    """Configure the speech cache
+
+    Parameters
+    ----------
+    directory: str
+        Directory of the persistent cache. None disables the disk cache.
+    size: int
+        Number of decoded phrases kept in memory.
+    """
+    global cache_dir, cache_size
+    cache_dir = directory
+    cache_size = size
+    with __lock:
+        while len(__memory) > cache_size:
+            __memory.popitem(last=False)
+
+
+def clear_cache(disk: bool=False):
+    """Clear the in-memory cache, and the disk cache if disk is True"""
+    with __lock:
+        __memory.clear()
+
+    if disk and cache_dir is not None and os.path.isdir(cache_dir):
+        for filename in os.listdir(cache_dir):
+            if filename.endswith(".wav"):
+                os.remove(os.path.join(cache_dir, filename))
+
+
+def cache_key(text: str, lang: str="en", speech_engine=None) -> str:
+    speech_engine = engine if speech_engine is None else speech_engine
+    engine_id = getattr(speech_engine, "cache_id", speech_engine.name)
+    return hashlib.sha256("\0".join([engine_id, lang, text]).encode("utf-8")).hexdigest()
+
+
+def __load(path):
+    try:
+        return AudioSegment.from_wav(path)
+    except (OSError, EOFError, wave.Error):
+        return None
+
+
+def __store(path, segment):
+    # the disk cache is best effort, e.g. a read-only home only loses the cache
+    tmp_path = None
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(suffix=".tmp", dir=os.path.dirname(path))
+        with os.fdopen(fd, "wb") as fp, wave.open(fp, "wb") as f:
+            f.setnchannels(segment.channels)
+            f.setsampwidth(segment.sample_width)
+            f.setframerate(segment.frame_rate)
+            f.writeframes(segment.raw_data)
+        os.replace(tmp_path, path)
+    except OSError:
+        if tmp_path is not None and os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def synthesize(text: str, lang: str="en") -> AudioSegment:
+    """Speech of the text, cached in memory and on disk
+
+    Parameters
+    ----------
+    text: str
+        Phrase to be read out.
+    lang: str
+        Language of the phrase, default is 'en'.
+
+    Returns
+    -------
+    AudioSegment
+        Decoded speech. Repeated phrases are served from the cache
+        without calling the engine or decoding again.
+    """
+    speech_engine = engine
+    key = cache_key(text, lang, speech_engine)
+
+    with __lock:
+        if key in __memory:
+            __memory.move_to_end(key)
+            return __memory[key]
+
+    segment = None
+    path = None
+    if cache_dir is not None:
+        path = os.path.join(cache_dir, key + ".wav")
+        if os.path.exists(path):
+            segment = __load(path)
+
+    if segment is None:
+        data = speech_engine.synthesize(text, lang)
+        segment = AudioSegment.from_file(io.BytesIO(data), format=speech_engine.format)
+        if path is not None:
+            __store(path, segment)
+
+    with __lock:
+        __memory[key] = segment
+        while len(__memory) > cache_size:
+            __memory.popitem(last=False)
+
+    return segment
+
+
+def prefetch(texts: list, lang: str="en") -> dict:
+    """Start synthesizing phrases concurrently
+
+    The phrases are synthesized in a shared thread pool, so the total latency
+    is that of the slowest phrase rather than the sum of all of them.
+
+    Parameters
+    ----------
+    texts: list
+        Phrases to be read out later.
+    lang: str
+        Language of the phrases, default is 'en'.
+
+    Returns
+    -------
+    dict
+        Future of the AudioSegment for each unique phrase.
+    """
+    global __executor
+    with __lock:
+        if __executor is None:
+            __executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="audio_plot_lib_tts")
+        executor = __executor
+
+    return {text: executor.submit(synthesize, text, lang) for text in dict.fromkeys(texts)}
@@ -0,0 +1,208 @@
+"""Benchmarks of audio_plot_lib
+
+Measures playable.plot, or render_stream for long series (wall time and peak memory), interactive.plot
+(document build time and serialized size) and the cold import time of the package
+and its submodules offline with the silent speech engine,
+and saves the results as JSON so that they can be compared between commits.
+
+    $ python -m benchmarks.run --output benchmarks/baseline.json
+    $ python -m benchmarks.run --quick --compare benchmarks/baseline.json
+"""
+import argparse
+import datetime
+import json
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+import warnings
+from unittest.mock import patch
+
+import numpy as np
+
+warnings.filterwarnings("ignore", category=RuntimeWarning)
+
+from audio_plot_lib import interactive, playable, tts  # noqa: E402
+
+
+PLAYABLE_DEFAULTS = {"length": 1000, "columns": 1, "ptype": "sequential", "duration": 50, "description": False}
+INTERACTIVE_DEFAULTS = {"points": 1000, "labels": 1}
+# longer series are rendered with render_stream and the chunks are discarded,
+# as holding their audio in memory like plot does would take gigabytes
+STREAM_LENGTH = 100000
+IMPORT_MODULES = ["audio_plot_lib", "audio_plot_lib.playable", "audio_plot_lib.tts", "audio_plot_lib.interactive"]
+
+
+def __measure(func, memory=True):
+    # a single run records both, so the time includes the overhead of tracemalloc unless memory is False
+    if memory:
+        tracemalloc.start()
+    try:
+        start = time.perf_counter()
+        result = func()
+        seconds = time.perf_counter() - start
+        peak_bytes = tracemalloc.get_traced_memory()[1] if memory else None
+    finally:
+        if memory:
+            tracemalloc.stop()
+
+    return result, seconds, peak_bytes
+
+
+def __sweeps(defaults, grid):
+    # vary one parameter at a time around the defaults
+    seen = []
+    for key, values in grid.items():
+        for value in values:
+            params = dict(defaults, **{key: value})
+            if params not in seen:
+                seen.append(params)
+                yield params
+
+
+def bench_playable(grid, memory=True):
+    tts.set_engine(tts.SilentEngine())
+    tts.set_cache(None)
+
+    for params in __sweeps(PLAYABLE_DEFAULTS, grid):
+        rng = np.random.default_rng(0)
+        lines = np.cumsum(rng.standard_normal((params["length"], params["columns"])), axis=0)
+        if params["columns"] > 1 and params["length"] <= params["columns"]:
+            continue
+
+        kwargs = {"ptype": params["ptype"], "duration": params["duration"], "description": params["description"]}
+        if params["length"] > STREAM_LENGTH:
+            benchmark = "playable.render_stream"
+            audio_bytes, seconds, peak_bytes = __measure(
+                lambda: sum(chunk.nbytes for chunk in playable.render_stream(lines, **kwargs)), memory)
+        else:
+            benchmark = "playable.plot"
+            tones, seconds, peak_bytes = __measure(lambda: playable.plot(lines, autoplay=False, **kwargs), memory)
+            audio_bytes = len(tones.raw_data)
+
+        yield {"benchmark": benchmark, "params": params, "seconds": seconds,
+               "peak_bytes": peak_bytes, "audio_bytes": audio_bytes}
+
+
+def __build_interactive(y, x, label):
+    from bokeh.embed import file_html, json_item
+    from bokeh.resources import CDN
+
+    with patch.object(interactive, "show") as mock_show, patch("IPython.display.display"), \
+            patch.object(interactive, "output_notebook"):
+        interactive.plot(y, x=x, label=label, slider_partitions=30)
+    layout = mock_show.call_args[0][0]
+
+    return len(file_html(layout, CDN).encode("utf-8")), len(json.dumps(json_item(layout)).encode("utf-8"))
+
+
+def bench_interactive(grid, memory=True):
+    for params in __sweeps(INTERACTIVE_DEFAULTS, grid):
+        rng = np.random.default_rng(0)
+        x = np.tile(np.arange(params["points"] // params["labels"]), params["labels"])
+        y = rng.standard_normal(len(x))
+        label = np.repeat(np.arange(params["labels"]), params["points"] // params["labels"])
+
+        (html_bytes, json_bytes), seconds, peak_bytes = __measure(lambda: __build_interactive(y, x, label), memory)
+
+        yield {"benchmark": "interactive.plot", "params": params, "seconds": seconds,
+               "peak_bytes": peak_bytes, "html_bytes": html_bytes, "json_bytes": json_bytes}
+
+
+def bench_import(modules, repeat=5):
+    # each import runs in a fresh interpreter, and the best of the runs is kept
+    for module in modules:
+        times = []
+        for _ in range(repeat):
+            stderr = subprocess.run([sys.executable, "-X", "importtime", "-c", "import " + module],
+                                    capture_output=True, text=True, check=True).stderr
+            # the last line is the cumulative time of the module itself in microseconds
+            last = [line for line in stderr.splitlines() if line.startswith("import time:")][-1]
+            times.append(int(last.split("|")[1]) / 1e6)
+
+        yield {"benchmark": "import", "params": {"module": module}, "seconds": min(times), "peak_bytes": None}
+
+
+def __metadata():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True).stdout.strip()
+    except OSError:
+        commit = None
+
+    return {"commit": commit or None, "python": platform.python_version(), "numpy": np.__version__,
+            "platform": platform.platform(),
+            "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat()}
+
+
+def compare(results, baseline, threshold=1.2):
+    """Print the ratio to the baseline for each benchmark and return the regressions"""
+    previous = {json.dumps([r["benchmark"], r["params"]], sort_keys=True): r for r in baseline["results"]}
+    regressions = []
+
+    for result in results:
+        old = previous.get(json.dumps([result["benchmark"], result["params"]], sort_keys=True))
+        if old is None:
+            continue
+
+        for metric in ["seconds", "peak_bytes", "html_bytes", "json_bytes"]:
+            if not old.get(metric) or result.get(metric) is None:
+                continue
+            ratio = result[metric] / old[metric]
+            flag = ""
+            if ratio > threshold:
+                flag = "  REGRESSION"
+                regressions.append((result["benchmark"], result["params"], metric, ratio))
+            print("{:18s} {:60s} {:10s} x{:.2f}{}".format(
+                result["benchmark"], json.dumps(result["params"]), metric, ratio, flag))
+
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--output", help="JSON file to save the results")
+    parser.add_argument("--compare", help="JSON file of a baseline to compare with")
+    parser.add_argument("--threshold", type=float, default=1.2, help="ratio regarded as a regression")
+    parser.add_argument("--quick", action="store_true", help="small sizes only")
+    parser.add_argument("--no-memory", action="store_true", help="skip peak memory measurement, for exact times")
+    parser.add_argument("--only", choices=["playable", "interactive", "import"], help="run one of the suites")
+    args = parser.parse_args(argv)
+
+    lengths = [100, 1000, 10000] if args.quick else [100, 1000, 10000, 100000, 1000000]
+    points = [100, 1000, 10000] if args.quick else [100, 1000, 10000, 100000, 1000000]
+
+    playable_grid = {"length": lengths, "columns": [1, 2, 5], "ptype": ["sequential", "overlay"],
+                     "duration": [20, 50, 200], "description": [False, True]}
+    interactive_grid = {"points": points, "labels": [1, 2, 3]}
+
+    results = []
+    suites = []
+    if args.only in [None, "playable"]:
+        suites.append(bench_playable(playable_grid, not args.no_memory))
+    if args.only in [None, "interactive"]:
+        suites.append(bench_interactive(interactive_grid, not args.no_memory))
+    if args.only in [None, "import"]:
+        suites.append(bench_import(IMPORT_MODULES))
+
+    for suite in suites:
+        for result in suite:
+            print("{:18s} {:60s} {:8.3f} s".format(result["benchmark"], json.dumps(result["params"]),
+                                                    result["seconds"]), flush=True)
+            results.append(result)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"metadata": __metadata(), "results": results}, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        if regressions:
+            return 1
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
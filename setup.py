@@ -18,7 +18,11 @@ setup(
     url="https://github.com/hassaku/audio-plot-lib",
     packages=["audio_plot_lib"],
     include_package_data=True,
-    install_requires=["pydub", "numpy", "gTTS", "bokeh", "ipython"],
+    # the templates and views of interactive need bokeh 3, which needs Python 3.8
+    python_requires=">=3.8",
+    install_requires=["pydub", "numpy", "gTTS", "bokeh>=3", "ipython"],
+    # flac, ogg and mp3 output of playable.save
+    extras_require={"compressed": ["soundfile"]},
     tests_require=[],
     license="MIT",
     keywords="audio plot visually-impaired",
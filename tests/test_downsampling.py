@@ -0,0 +1,29 @@
+from unittest import TestCase
+from audio_plot_lib import downsampling
+import numpy as np
+
+
+class TestDownsampling(TestCase):
+    def setUp(self):
+        self.data = np.sin(np.arange(0, 100, 0.01))
+        self.data[1234] = 10
+        self.data[5678] = -10
+
+
+    def test_methods_bound_length(self):
+        for method in downsampling.METHODS:
+            reduced = downsampling.reduce(self.data.reshape((-1, 1)), 100, method)
+            self.assertLessEqual(reduced.shape[0], 100)
+            self.assertEqual(reduced.shape[1], 1)
+
+
+    def test_spikes_are_kept(self):
+        for method in ["minmax", "lttb"]:
+            reduced = downsampling.reduce(self.data.reshape((-1, 1)), 100, method)
+            self.assertEqual(reduced.max(), 10)
+            self.assertEqual(reduced.min(), -10)
+
+
+    def test_short_data_is_untouched(self):
+        lines = self.data[:50].reshape((-1, 1))
+        self.assertIs(downsampling.reduce(lines, 100), lines)
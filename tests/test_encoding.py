@@ -0,0 +1,50 @@
+from unittest import TestCase, skipUnless
+from audio_plot_lib import encoding
+from pydub import AudioSegment
+import importlib.util
+import io
+import numpy as np
+import os
+import tempfile
+import wave
+
+
+class TestEncoding(TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.samples = (np.arange(2000, dtype=np.int16) * 31).reshape(-1, 2)
+
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+
+    def test_to_wav_is_a_stereo_wav_file(self):
+        data = encoding.to_wav([self.samples[:300], self.samples[300:]])
+        with wave.open(io.BytesIO(data)) as f:
+            self.assertEqual((f.getnchannels(), f.getsampwidth(), f.getframerate()), (2, 2, 44100))
+            self.assertEqual(f.readframes(f.getnframes()), self.samples.tobytes())
+
+
+    def test_as_array_shares_the_data(self):
+        segment = AudioSegment(data=self.samples.tobytes(), sample_width=2, frame_rate=44100, channels=2)
+        samples = encoding.as_array(segment)
+        np.testing.assert_array_equal(samples, self.samples)
+        self.assertFalse(samples.flags.owndata)
+
+
+    def test_write_and_memmap(self):
+        path = os.path.join(self.tmpdir.name, "graph.wav")
+        encoding.write(path, [self.samples[:300], self.samples[300:]])
+        np.testing.assert_array_equal(encoding.memmap(path), self.samples)
+
+
+    @skipUnless(importlib.util.find_spec("soundfile"), "soundfile is not installed")
+    def test_write_compressed(self):
+        import soundfile
+
+        path = os.path.join(self.tmpdir.name, "graph.flac")
+        encoding.write(path, [self.samples])
+        samples, frame_rate = soundfile.read(path, dtype="int16")
+        np.testing.assert_array_equal(samples, self.samples)
+        self.assertEqual(frame_rate, 44100)
@@ -1,7 +1,11 @@
 from unittest import TestCase
+from audio_plot_lib import interactive
 from audio_plot_lib.interactive import plot
 import numpy as np
+import os
+import tempfile
 from unittest.mock import patch
+from bokeh.models import ColumnDataSource, CustomJS, GlyphRenderer, Plot
 
 def plot_with_all_options(data):
     plot(y=data, x=data, label=[0, 0, 1], width=100, height=100, title="title")
@@ -23,3 +27,124 @@ class TestInteractive(TestCase):
             plot_with_all_options(self.ndarray_data.tolist())
             self.assertTrue(mock_show.called)
 
+
+
+    def test_lookup_is_sorted_by_label_and_x(self):
+        lookup = interactive.__dict__["__lookup"]([3, 1, 2, 0], [30, 10, 20, 0], [0, 0, 1, 1])
+        np.testing.assert_array_equal(lookup["x"], [1, 3, 0, 2])
+        np.testing.assert_array_equal(lookup["y"], [10, 30, 0, 20])
+        np.testing.assert_array_equal(lookup["offsets"], [0, 2, 4])
+        np.testing.assert_array_equal(lookup["ranges"], [1, 3, 10, 30, 0, 2, 0, 20, 0, 3, 0, 30])
+
+
+    def test_lookup_keeps_sorted_input(self):
+        y = np.linspace(0, 1, 10, dtype=np.float32)
+        lookup = interactive.__dict__["__lookup"](np.arange(10, dtype=np.int32), y, np.zeros(10, dtype=np.int32))
+        self.assertEqual(lookup["y"].dtype, np.float32)
+        self.assertTrue(np.shares_memory(lookup["y"], y))
+
+
+    def test_sound_of_int16_points(self):
+        values = np.array([-30000, 0, 30000], dtype=np.int16)
+        sounds = []
+        for dtype in [np.int16, np.float64]:
+            lookup = interactive.__dict__["__lookup"](values.astype(dtype), values.astype(dtype), np.zeros(3, dtype=int))
+            sounds.append(interactive.__dict__["__sound"](lookup["x"], lookup["y"], lookup["label"], lookup["ranges"],
+                                                          False))
+            self.assertEqual(lookup["x"].dtype, dtype)
+        np.testing.assert_array_equal(sounds[0]["freq"], sounds[1]["freq"])
+        np.testing.assert_array_equal(sounds[0]["pan"], [-1, 0, 1])
+
+
+    def test_plot_shares_one_data_source(self):
+        with patch('audio_plot_lib.interactive.show') as mock_show:
+            plot_with_all_options(self.ndarray_data)
+            layout = mock_show.call_args[0][0]
+            sources = list(layout.select({"type": ColumnDataSource}))
+            self.assertEqual(len(sources), 1)
+            self.assertEqual(type(sources[0].data["x"]), np.ndarray)
+
+
+    def test_callbacks_call_into_runtime(self):
+        with patch('audio_plot_lib.interactive.show') as mock_show, \
+                patch('IPython.display.display') as mock_display:
+            plot_with_all_options(self.ndarray_data)
+            layout = mock_show.call_args[0][0]
+            self.assertEqual(mock_display.call_count, 1)
+            self.assertIn("audioPlotLib.start()", mock_display.call_args[0][0].data)
+            for callback in layout.select({"type": CustomJS}):
+                self.assertIn("audioPlotLib.", callback.code)
+                self.assertLess(len(callback.code), 300)
+            codes = [callback.code for callback in layout.select({"type": CustomJS})]
+            self.assertTrue(any("audioPlotLib.leave(" in code for code in codes))
+
+
+    def test_runtime_is_displayed_once(self):
+        interactive.__dict__["__runtime_displayed"] = False
+        with patch('audio_plot_lib.interactive.show'), patch('IPython.display.display') as mock_display:
+            for _ in range(3):
+                plot_with_all_options(self.ndarray_data)
+            htmls = [call[0][0].data for call in mock_display.call_args_list]
+            self.assertEqual(sum("window.audioPlotLib = " in html for html in htmls), 1)
+            self.assertTrue(all("audioPlotLib.start()" in html for html in htmls))
+
+
+    def test_plot_with_level_of_detail(self):
+        y = np.sin(np.arange(0, 100, 0.01))
+        with patch('audio_plot_lib.interactive.show') as mock_show:
+            plot(y, width=100, lod_threshold=1000)
+            layout = mock_show.call_args[0][0]
+            sizes = sorted(len(source.data["x"]) for source in layout.select({"type": ColumnDataSource}))
+            self.assertEqual(sizes, [100, len(y)])
+
+
+    def test_plot_with_multiple_axes(self):
+        y = np.concatenate([np.sin(np.arange(2000) / 100), 100 + np.cos(np.arange(2000) / 100)])
+        for lod_threshold in [len(y), 1000]:
+            with patch('audio_plot_lib.interactive.show') as mock_show:
+                plot(y, label=np.repeat([0, 1], 2000), multiple_axes=True, width=100, lod_threshold=lod_threshold)
+                layout = mock_show.call_args[0][0]
+                renderers = layout.select({"type": GlyphRenderer})
+                self.assertEqual(sorted((r.y_range_name, r.view.filter.group) for r in renderers), [("0", 0), ("1", 1)])
+                y_ranges = layout.select_one({"type": Plot}).extra_y_ranges
+                self.assertEqual((y_ranges["0"].end, y_ranges["1"].start), (y[:2000].max() + 1, y[2000:].min() - 1))
+
+
+    def test_plot_with_audio_sprite(self):
+        y = np.sin(np.arange(200) / 10)
+        with patch('audio_plot_lib.interactive.show') as mock_show:
+            plot(y, label=np.repeat([0, 1], 100), sprite_bins=8)
+            layout = mock_show.call_args[0][0]
+            source = layout.select_one({"name": "audio_plot_lib_points"})
+            sprite = layout.select_one({"name": "audio_plot_lib_sprite"})
+            frame_rate, frames = sprite.tags
+            self.assertEqual(frame_rate, 16000)
+            self.assertEqual(len(sprite.data["samples"]), (source.data["tone"].max() + 1) * frames)
+            self.assertLessEqual(len(np.unique(source.data["tone"])), 16)
+            for callback in layout.select({"type": CustomJS}):
+                if "hover" in callback.code or "slide" in callback.code:
+                    self.assertIs(callback.args["sprite"], sprite)
+
+
+    def test_sound_is_precomputed(self):
+        lookup = interactive.__dict__["__lookup"]([0, 1, 2, 0, 1], [0, 1, 2, 5, 5], [0, 0, 0, 1, 1])
+        sound = interactive.__dict__["__sound"](lookup["x"], lookup["y"], lookup["label"], lookup["ranges"], True)
+        np.testing.assert_allclose(sound["freq"], [261.626, 261.626*1.5, 261.626*2, 261.626, 261.626], rtol=1e-6)
+        np.testing.assert_allclose(sound["pan"], [-1, 0, 1, -1, 1])
+
+
+    def test_save(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "graph.html")
+            self.assertEqual(interactive.save(path, [3, 1, 2], x=[2, 0, 1]), path)
+            with open(path) as f:
+                html = f.read()
+            self.assertIn("unmuteButton", html)
+            self.assertIn("window.audioPlotLib", html)
+            self.assertFalse(os.path.exists(os.path.join(tmpdir, "graph.bin")))
+
+            interactive.save(path, [3, 1, 2], x=[2, 0, 1], sidecar=True)
+            with open(os.path.join(tmpdir, "graph.bin"), "rb") as f:
+                data = f.read()
+            np.testing.assert_array_equal(np.frombuffer(data[:24], dtype="<f8"), [0, 1, 2])
+            np.testing.assert_array_equal(np.frombuffer(data[24:48], dtype="<f8"), [1, 2, 3])
@@ -0,0 +1,90 @@
+from unittest import TestCase
+from audio_plot_lib import synthesis
+from audio_plot_lib.live import RingBuffer
+from audio_plot_lib.playable import CallbackSink, LiveSonifier
+import asyncio
+import time
+import numpy as np
+
+
+class TestLive(TestCase):
+    def setUp(self):
+        self.samples = np.arange(20, dtype=np.int16).reshape(-1, 2)
+
+
+    def test_ring_buffer_wraps_around(self):
+        ring = RingBuffer(8)
+        ring.write(self.samples[:6])
+        np.testing.assert_array_equal(ring.read(4), self.samples[:4])
+        ring.write(self.samples[6:])
+        np.testing.assert_array_equal(ring.read(8), self.samples[4:])
+        self.assertEqual((ring.written, ring.read_position), (10, 10))
+
+
+    def test_ring_buffer_policies(self):
+        ring = RingBuffer(8)
+        ring.write(self.samples[:6])
+        self.assertEqual(ring.write(self.samples[6:], "drop_newest"), 4)
+        self.assertEqual(ring.write(self.samples[6:], "drop_oldest"), 0)
+        self.assertEqual(ring.overwritten, (0, 2))
+        np.testing.assert_array_equal(ring.read(8), self.samples[2:])
+
+        ring.close()
+        self.assertIsNone(ring.read(8))
+        self.assertEqual(ring.write(self.samples), 10)
+
+
+    def test_ring_buffer_drops_whole_spans(self):
+        ring = RingBuffer(8)
+        ring.write(self.samples[:6])
+        np.testing.assert_array_equal(ring.read(1), self.samples[:1])
+        # the rest of the span being read is kept, and the next span is dropped whole
+        self.assertEqual(ring.write(self.samples[6:], "drop_oldest", [2, 4, 6]), 0)
+        self.assertEqual(ring.overwritten, (2, 4))
+        np.testing.assert_array_equal(ring.read(8), self.samples[[1, 4, 5, 6, 7, 8, 9]])
+        self.assertEqual((ring.written, ring.read_position), (10, 10))
+
+
+    def test_notes_reach_the_sink(self):
+        chunks = []
+        with LiveSonifier(CallbackSink(chunks.append), duration=20, min_value=0, max_value=4,
+                          scaling="fixed") as sonifier:
+            sonifier.feed([0, 2, 4, 8])
+
+        freqs = [130.813, 130.813*2.5, 130.813*4, 130.813*4]
+        notes = synthesis.render_notes(freqs, [0.0]*4, 20, -5, 5)
+        np.testing.assert_array_equal(np.concatenate(chunks), notes)
+        self.assertEqual((sonifier.pushed, sonifier.dropped), (4, 0))
+
+
+    def test_feed_async(self):
+        chunks = []
+        sonifier = LiveSonifier(CallbackSink(chunks.append), duration=20)
+
+        async def feed():
+            queue = asyncio.Queue()
+            for value in [1, 3, 2, None]:
+                queue.put_nowait(value)
+            await sonifier.feed_async(queue)
+
+        asyncio.run(feed())
+        sonifier.close()
+        self.assertEqual(sonifier.pushed, 3)
+        self.assertEqual((sonifier.min_value, sonifier.max_value), (1, 3))
+        self.assertEqual(len(np.concatenate(chunks)), 3 * synthesis.note_frames(20, 5))
+
+
+    def test_drop_oldest_drops_whole_notes(self):
+        chunks = []
+
+        def slow(samples):
+            chunks.append(samples)
+            time.sleep(0.002)
+
+        with LiveSonifier(CallbackSink(slow), duration=20, latency=50, policy="drop_oldest") as sonifier:
+            sonifier.feed(range(30))
+
+        note_frames = synthesis.note_frames(20, 5)
+        self.assertGreater(sonifier.dropped, 0)
+        self.assertEqual(len(np.concatenate(chunks)) % note_frames, 0)
+        self.assertEqual(len(np.concatenate(chunks)), (sonifier.pushed - sonifier.dropped) * note_frames)
@@ -1,7 +1,15 @@
 from unittest import TestCase
-from audio_plot_lib.playable import plot
+from audio_plot_lib import encoding, tts
+from audio_plot_lib.playable import NoteBank, PlotSession, RenderStats, plot, render_batch, render_stream, save, write_wav
 from pydub import AudioSegment
+from unittest.mock import patch
 import numpy as np
+import os
+import subprocess
+import sys
+import tempfile
+import tracemalloc
+import wave
 
 
 def plot_with_all_options(data):
@@ -12,6 +20,8 @@ def plot_with_all_options(data):
 
 class TestPlayable(TestCase):
     def setUp(self):
+        tts.set_engine(tts.SilentEngine())
+        tts.set_cache(None)
         self.ndarray_data = np.array([np.arange(0, np.pi*2, 0.1), -1 * np.arange(0, np.pi*2, 0.1)]).T
 
 
@@ -24,3 +34,159 @@ class TestPlayable(TestCase):
         ret = plot_with_all_options(self.ndarray_data.tolist())
         self.assertEqual(type(ret), AudioSegment)
 
+
+    def test_render_stream_matches_plot(self):
+        for ptype in ["sequential", "overlay"]:
+            tones = plot(self.ndarray_data, ptype=ptype, duration=20, autoplay=False)
+            chunks = list(render_stream(self.ndarray_data, ptype=ptype, duration=20, chunk_size=1000))
+            self.assertTrue(all(len(chunk) == 1000 for chunk in chunks[:-1]))
+            np.testing.assert_array_equal(np.concatenate(chunks).reshape(-1), tones.get_array_of_samples())
+
+            with tempfile.TemporaryDirectory() as tmpdir:
+                path = os.path.join(tmpdir, "graph.wav")
+                write_wav(path, render_stream(self.ndarray_data, ptype=ptype, duration=20))
+                with wave.open(path) as f:
+                    self.assertEqual(f.getnframes(), tones.frame_count())
+
+
+    def test_overlay_more_than_five_lines(self):
+        data = np.array([np.sin(np.arange(0, 10, 0.1) + phase) for phase in range(8)]).T
+        clipped = plot(data, ptype="overlay", duration=20, gain=0, description=False, autoplay=False)
+        mixed = plot(data, ptype="overlay", duration=20, gain=0, description=False, autoplay=False,
+                     timbres=["sine", "triangle"], headroom=1)
+        self.assertEqual(np.max(np.abs(clipped.get_array_of_samples())), 32767)
+        self.assertLess(np.max(np.abs(mixed.get_array_of_samples())), 32767)
+
+
+    def test_plot_with_target_duration(self):
+        data = np.sin(np.arange(0, 1000, 0.1))
+        full = plot(data[:100], duration=20, description=False, autoplay=False)
+        reduced = plot(data, duration=20, description=False, autoplay=False, target_duration=2000, downsample="lttb")
+        self.assertEqual(full.frame_count(), reduced.frame_count())
+
+
+    def test_render_batch(self):
+        items = [{"lines": self.ndarray_data, "ptype": "overlay", "duration": 20, "name": "ok"},
+                 {"lines": self.ndarray_data, "ptype": "unknown"}]
+        with tempfile.TemporaryDirectory() as tmpdir:
+            results = render_batch(items, out_dir=tmpdir, workers=2)
+            self.assertEqual([result["name"] for result in results], ["ok", "plot_1"])
+            self.assertIsNone(results[0]["error"])
+            self.assertTrue(os.path.exists(results[0]["path"]))
+            self.assertIn("NotImplementedError", results[1]["error"])
+            self.assertIsNone(results[1]["path"])
+
+
+    def test_plot_with_stats(self):
+        events = []
+        stats = RenderStats(callback=lambda stage, seconds, nbytes: events.append(stage))
+        tones = plot(self.ndarray_data, ptype="overlay", autoplay=False, stats=stats)
+        self.assertEqual(stats.notes, self.ndarray_data.size)
+        self.assertGreater(stats.samples, 0)
+        for stage in ["speech", "waveform", "envelope", "pan", "mix", "output"]:
+            self.assertIn(stage, stats.stages)
+            self.assertIn(stage, events)
+        self.assertEqual(stats.stages["output"].bytes, len(tones.raw_data))
+        self.assertGreater(stats.stages["speech"].bytes, 0)
+
+        stats = RenderStats(trace_memory=True)
+        plot(self.ndarray_data, autoplay=False, stats=stats)
+        tracemalloc.stop()
+        # the temporaries of the waveform are counted besides its output
+        waveform = stats.stages["waveform"]
+        self.assertGreater(waveform.allocated, waveform.bytes / waveform.calls)
+
+
+    def test_playable_without_ipython(self):
+        # IPython and bokeh are neither imported nor needed to render audio
+        code = ("import sys; sys.modules['IPython'] = None\n"
+                "from audio_plot_lib import playable, tts\n"
+                "tts.set_engine(tts.SilentEngine()); tts.set_cache(None)\n"
+                "playable.plot([0, 1, 2], description=False, autoplay=False)\n"
+                "assert 'bokeh' not in sys.modules\n")
+        subprocess.run([sys.executable, "-c", code], check=True, capture_output=True,
+                       cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+    def test_plot_with_memmap(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            lines = np.memmap(os.path.join(tmpdir, "lines.bin"), dtype=np.float32, mode="w+",
+                              shape=self.ndarray_data.shape)
+            lines[:] = self.ndarray_data
+            tones = plot(lines, duration=20, max_points=30, autoplay=False)
+            expected = plot(np.array(lines), duration=20, max_points=30, autoplay=False)
+            self.assertEqual(tones.raw_data, expected.raw_data)
+            np.testing.assert_array_equal(lines, self.ndarray_data.astype(np.float32))
+            del lines
+
+
+    def test_plot_with_int16(self):
+        lines = np.array([-30000, 0, 30000], dtype=np.int16)
+        for ptype in ["sequential", "overlay"]:
+            tones = plot(lines, ptype=ptype, duration=20, description=False, autoplay=False)
+            expected = plot(lines.astype(np.float64), ptype=ptype, duration=20, description=False, autoplay=False)
+            self.assertEqual(tones.raw_data, expected.raw_data)
+
+
+    def test_plot_with_preview_quality(self):
+        tones = plot(self.ndarray_data, duration=20, quality="preview", autoplay=False)
+        self.assertEqual((tones.frame_rate, tones.channels, tones.sample_width), (16000, 1, 2))
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = save(os.path.join(tmpdir, "graph.wav"), self.ndarray_data, duration=20, quality="preview",
+                        sample_width=1)
+            with wave.open(path) as f:
+                self.assertEqual((f.getframerate(), f.getnchannels(), f.getsampwidth()), (16000, 1, 1))
+                self.assertEqual(f.getnframes(), int(tones.frame_count()))
+
+
+    def test_note_bank_reuses_repeated_values(self):
+        data = np.tile([0, 1, 2, np.nan], 100)
+        bank = NoteBank(size=3)
+        tones = plot(data, duration=20, autoplay=False, bank=bank)
+        self.assertEqual(tones.raw_data, plot(data, duration=20, autoplay=False).raw_data)
+        # the note evicted from the full bank is synthesized again for the second block
+        self.assertEqual((bank.hits, bank.misses, len(bank.notes)), (395, 5, 3))
+
+        bank = NoteBank(semitones=12)
+        plot(np.linspace(0, 1, 400), duration=20, autoplay=False, bank=bank, min_freq=220, max_freq=880)
+        self.assertEqual(bank.misses, 3)
+
+
+    def test_save_and_autoplay_match_plot(self):
+        tones = plot(self.ndarray_data, duration=20, autoplay=False)
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = save(os.path.join(tmpdir, "graph.wav"), self.ndarray_data, duration=20)
+            np.testing.assert_array_equal(encoding.memmap(path), encoding.as_array(tones))
+
+        with patch("IPython.display.display") as mock_display:
+            plot(self.ndarray_data, duration=20)
+            self.assertEqual(mock_display.call_args[0][0].data, encoding.to_wav(encoding.as_array(tones)))
+
+
+    def test_session_synthesizes_only_new_notes(self):
+        session = PlotSession(self.ndarray_data[:40], ptype="overlay", duration=20)
+        session.render()
+        self.assertEqual(session.cache.synthesized, 80)
+
+        tones = session.append(self.ndarray_data[10:20])
+        self.assertEqual(session.cache.synthesized, 100)
+        self.assertEqual(tones.raw_data, plot(session.lines, ptype="overlay", duration=20, autoplay=False).raw_data)
+
+        # a new maximum changes the pitch of every note
+        tones = session.append(self.ndarray_data[40:])
+        self.assertEqual(session.cache.synthesized, 100 + 2 * len(session.lines))
+        self.assertEqual(tones.raw_data, plot(session.lines, ptype="overlay", duration=20, autoplay=False).raw_data)
+
+
+    def test_session_widens_dtype_of_appended_rows(self):
+        session = PlotSession([1, 2, 3, 5], duration=20)
+        session.append([4])
+        tones = session.append([4.7])
+        self.assertEqual(session.lines.dtype, np.float64)
+        self.assertEqual(session.lines[-1, 0], 4.7)
+        self.assertEqual(tones.raw_data, plot(session.lines, duration=20, autoplay=False).raw_data)
+
+        # the phrase of the earlier maximum is not kept
+        session.append([9])
+        self.assertEqual(sum("maximum" in phrase for phrase in session.cache.speech), 1)
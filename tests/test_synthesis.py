@@ -0,0 +1,33 @@
+from unittest import TestCase
+from audio_plot_lib import synthesis
+from pydub.generators import Sine, Pulse, Square, Sawtooth, Triangle
+import numpy as np
+
+
+def render_with_pydub(generator, freqs, pans, duration, gain):
+    data = b""
+    for freq, pan in zip(freqs, pans):
+        wav = generator(freq).to_audio_segment(duration=duration).apply_gain(gain)
+        data += wav.fade_in(int(duration/4)).fade_out(int(duration/4)).pan(pan).raw_data
+    return np.frombuffer(data, dtype=np.int16).reshape((-1, 2))
+
+
+class TestSynthesis(TestCase):
+    def setUp(self):
+        self.freqs = np.array([130.813, 261.626, 400.5, 523.252])
+        self.pans = -1.0 + np.arange(len(self.freqs)) / len(self.freqs) * 2
+
+
+    def test_render_notes_matches_pydub(self):
+        for waveform, generator in zip(synthesis.WAVEFORMS, [Sine, Pulse, Square, Sawtooth, Triangle]):
+            for duration in [20, 50]:
+                expected = render_with_pydub(generator, self.freqs, self.pans, duration, -5)
+                actual = synthesis.render_notes(self.freqs, self.pans, duration, -5, int(duration/4), waveform)
+                np.testing.assert_array_equal(actual, expected)
+
+
+    def test_mix_saturates(self):
+        track = synthesis.render_notes(self.freqs, self.pans, 20, 0, 5)
+        mixed = synthesis.mix([track, track, track])
+        self.assertEqual(mixed.shape, track.shape)
+        self.assertEqual(mixed.max(), 32767)
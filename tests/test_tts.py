@@ -0,0 +1,83 @@
+from unittest import TestCase
+from audio_plot_lib import tts
+from pydub import AudioSegment
+import os
+import tempfile
+import time
+
+
+class CountingEngine(tts.SilentEngine):
+    name = "counting"
+
+    def __init__(self):
+        super().__init__()
+        self.calls = 0
+
+    def synthesize(self, text, lang):
+        self.calls += 1
+        return super().synthesize(text, lang)
+
+
+class TestTTS(TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.engine = CountingEngine()
+        tts.set_engine(self.engine)
+        tts.set_cache(self.tmpdir.name)
+        tts.clear_cache()
+
+
+    def tearDown(self):
+        tts.set_engine(tts.SilentEngine())
+        tts.set_cache(None)
+        self.tmpdir.cleanup()
+
+
+    def test_synthesize_is_cached_in_memory(self):
+        first = tts.synthesize("minimum value is 0")
+        second = tts.synthesize("minimum value is 0")
+        self.assertEqual(type(first), AudioSegment)
+        self.assertIs(first, second)
+        self.assertEqual(self.engine.calls, 1)
+
+
+    def test_synthesize_is_cached_on_disk(self):
+        first = tts.synthesize("maximum value is 1", lang="ja")
+        tts.clear_cache()
+        second = tts.synthesize("maximum value is 1", lang="ja")
+        self.assertEqual(first.raw_data, second.raw_data)
+        self.assertEqual(self.engine.calls, 1)
+        self.assertEqual(os.listdir(self.tmpdir.name), [tts.cache_key("maximum value is 1", "ja") + ".wav"])
+
+
+    def test_synthesize_without_writable_cache(self):
+        # a directory can not be made under a file, whichever user runs the tests
+        path = os.path.join(self.tmpdir.name, "file")
+        open(path, "w").close()
+        tts.set_cache(os.path.join(path, "tts"))
+        segment = tts.synthesize("minimum value is 0")
+        self.assertEqual(type(segment), AudioSegment)
+        self.assertEqual(os.listdir(self.tmpdir.name), ["file"])
+
+
+    def test_cache_key_depends_on_language_and_engine(self):
+        self.assertNotEqual(tts.cache_key("line 1", "en"), tts.cache_key("line 1", "ja"))
+        self.assertNotEqual(tts.cache_key("line 1", "en"), tts.cache_key("line 1", "en", tts.GTTSEngine()))
+        self.assertNotEqual(tts.cache_key("line 1", "en", tts.SilentEngine(msec_per_char=50)),
+                            tts.cache_key("line 1", "en", tts.SilentEngine(msec_per_char=80)))
+
+
+    def test_prefetch_synthesizes_concurrently(self):
+        class SlowEngine(tts.SilentEngine):
+            name = "slow"
+
+            def synthesize(self, text, lang):
+                time.sleep(0.3)
+                return super().synthesize(text, lang)
+
+        tts.set_engine(SlowEngine())
+        start = time.time()
+        speech = tts.prefetch(["label {}".format(i) for i in range(6)] + ["label 0"])
+        segments = [future.result() for future in speech.values()]
+        self.assertEqual(len(segments), 6)
+        self.assertLess(time.time() - start, 0.3 * 6 / 2)